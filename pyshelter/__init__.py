@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+'''
+PyShelter is a manager of Fallout Shelter(C) saved games. The public classes
+are exposed lazily: the module defining each of them is only imported the
+first time the class is accessed, so that importing the package is cheap for
+short-lived invocations.
+'''
+
+from importlib import import_module
+
+
+_lazy_classes = {
+    'Dummy' : 'pyshelter.classes.dummy',
+    'Dwellers' : 'pyshelter.classes.dwellers',
+    'ExpeditionForecaster' : 'pyshelter.classes.forecaster',
+    'Expeditions' : 'pyshelter.classes.expeditions',
+    'Inventory' : 'pyshelter.classes.inventory',
+    'Lineage' : 'pyshelter.classes.lineage',
+    'PyShelter' : 'pyshelter.classes.pyshelter',
+    'Resources' : 'pyshelter.classes.resources',
+    'RoomPlanner' : 'pyshelter.classes.planner',
+    'Rooms' : 'pyshelter.classes.rooms',
+    'Vault' : 'pyshelter.classes.vault',
+}
+
+__all__ = sorted(_lazy_classes)
+
+
+def __dir__():
+    '''
+    Lists the public classes along with the attributes already loaded.
+    '''
+    return sorted(set(globals()) | set(_lazy_classes))
+
+
+def __getattr__(name):
+    '''
+    Imports the module defining the requested public class on first access and
+    caches the class in the package namespace.
+    '''
+    try:
+        module_name = _lazy_classes[name]
+    except KeyError:
+        raise AttributeError("module 'pyshelter' has no attribute '%s'"       \
+            % (name))
+
+    value = getattr(import_module(module_name), name)
+    globals()[name] = value
+    return value
@@ -7,16 +7,21 @@ other inhabitants of the Vault, such as pets and/or robots.
 '''
 
 from collections import defaultdict
-from pprint import pprint as pp
 
+from pyshelter.classes.lineage import Lineage
+from pyshelter.utils.instrumentation import instrument_class
+from pyshelter.utils.journal import Journal
 
+
+@instrument_class
 class Dwellers(list):
     '''
     The Dwellers class represents the human inhabitants of the Vault.
     '''
-    def __init__(self, raw_data=None):
+    def __init__(self, raw_data=None, journal=None):
         """
-        Initializes the Dwellers of the Vault.
+        Initializes the Dwellers of the Vault. Edits are recorded by journal,
+        which can be shared with the PyShelter instance owning the Dwellers.
         """
         if raw_data is None:
             raise ValueError('Dwellers expects raw_data to be provided.')
@@ -25,6 +30,7 @@ class Dwellers(list):
                 "not %s." % (type(raw_data).__name__))
 
         super(Dwellers, self).__init__(raw_data)
+        self.journal = journal if journal is not None else Journal()
 
 
     def coffee_break(self, dweller_index=None):
@@ -39,7 +45,7 @@ class Dwellers(list):
                 % (type(dweller_index).__name__))
 
         try:
-            self[dweller_index]["savedRoom"] = -1
+            self.journal.assign(self[dweller_index], "savedRoom", -1)
         except Exception as e:
             print(e)
             raise
@@ -80,26 +86,42 @@ class Dwellers(list):
             if len(ids) > 1}
 
 
+    @property
+    def lineage(self):
+        '''
+        Lazily returns the Lineage of the Dwellers, to check which of them can
+        be paired. It is built once and not reconciled on access: once
+        Dwellers are added or removed, the caller reconciles it, either with
+        Lineage.add and Lineage.remove or at once with lineage.update(self).
+        '''
+        if not hasattr(self, '_lineage'):
+            self._lineage = Lineage(self)
+
+        return self._lineage
+
+
     def reset_dweller(self, dweller_index):
         '''
         Resets a Dweller's experience and health to level 1, given its index.
         '''
         try:
-            self[dweller_index]["experience"] = {
-                "accum": 0,
-                "currentLevel": 1,
-                "experienceValue": 605.0,
-                "needLvUp": False,
-                "storage": 0,
-                "wastelandExperience": 0
-            }
-            self[dweller_index]["health"] = {
-                "healthValue": 105.0,
-                "lastLevelUpdated": 1,
-                "maxHealth": 105.0,
-                "permaDeath": False,
-                "radiationValue": 0.0
-            }
+            dweller = self[dweller_index]
+            with self.journal.transaction():
+                self.journal.assign(dweller, "experience", {
+                    "accum": 0,
+                    "currentLevel": 1,
+                    "experienceValue": 605.0,
+                    "needLvUp": False,
+                    "storage": 0,
+                    "wastelandExperience": 0
+                })
+                self.journal.assign(dweller, "health", {
+                    "healthValue": 105.0,
+                    "lastLevelUpdated": 1,
+                    "maxHealth": 105.0,
+                    "permaDeath": False,
+                    "radiationValue": 0.0
+                })
         except IndexError as e:
             print("There is no Dweller with ID %s." % (dweller_index))
             raise
@@ -8,16 +8,20 @@ Team can carry a maximum number of items. If this limit is hit, the Team is
 forced to return to the Vault.
 '''
 
+from pyshelter.utils.instrumentation import instrument_class
 from pyshelter.utils.io import load_static_data
+from pyshelter.utils.journal import Journal
 
 
+@instrument_class
 class Expeditions(list):
     '''
     The Expedition class represents Teams of Dwellers sent to the Wasteland.
     '''
-    def __init__(self, value=None):
+    def __init__(self, value=None, journal=None):
         """
-        Initializes the Expedition Teams.
+        Initializes the Expedition Teams. Edits are recorded by journal, which
+        can be shared with the PyShelter instance owning the Teams.
         """
         if value is None:
             raise ValueError('Expedition data must be provided.')
@@ -26,6 +30,7 @@ class Expeditions(list):
                 "%s." % (type(value).__name__))
 
         super(Expeditions, self).__init__(value)
+        self.journal = journal if journal is not None else Journal()
 
 
     def drop_junk(self, quality='normal'):
@@ -38,13 +43,15 @@ class Expeditions(list):
             'Weapon' : load_static_data('weapons')
         }
 
-        for expedition in self:
+        with self.journal.transaction():
+            for expedition in self:
 
-            loot_to_keep = []
+                loot_to_keep = []
 
-            for item in expedition['teamEquipment']['inventory']['items']:
-                if sd[item['type']][item['id']]['rarity'] not in ('common', 'normal'):
-                    loot_to_keep.append(item)
-                    continue
+                for item in expedition['teamEquipment']['inventory']['items']:
+                    if sd[item['type']][item['id']]['rarity'] not in ('common', 'normal'):
+                        loot_to_keep.append(item)
+                        continue
 
-            expedition['teamEquipment']['inventory']['items'] = loot_to_keep
\ No newline at end of file
+                self.journal.assign(expedition['teamEquipment']['inventory'], \
+                    'items', loot_to_keep)
\ No newline at end of file
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+'''
+The ExpeditionForecaster class estimates, for each Team exploring the
+Wasteland, when it will be forced back to the Vault, what it will bring back
+and when it is best recalled. Teams stop exploring when they hit their item
+carry limit, or when one of their members dies.
+
+The estimate is a Monte Carlo simulation, hour by hour, vectorized with NumPy
+over all the trials of a Team. Items are found at a rate growing with the
+Perception of the Team; their rarity follows the static catalogs, weighted by
+the Luck of the Team. Damage grows with the time spent in the Wasteland and
+shrinks with Endurance; Stimpacks extend the health of the Team. The game does
+not publish its formulas: all the rates are parameters of the forecaster, to
+be calibrated on real saves.
+
+NumPy (1.17 or later) is only needed to run the forecasts, and is installed
+by the 'forecast' extra of the package. Large batches, e.g. all the Teams
+of thousands of Vaults, are spread over a pool of processes by simulate_teams.
+'''
+
+from pyshelter.utils.instrumentation import instrument_class
+from pyshelter.utils.io import load_static_data
+
+
+# Indexes of the SPECIAL stats in the stats of a Dweller.
+STRENGTH, PERCEPTION, ENDURANCE, LUCK = 1, 2, 3, 7
+
+RARITIES = ('normal', 'rare', 'legendary')
+
+# Default parameters of the simulation, per Dweller and per hour.
+PARAMETERS = {
+    'capacity_base' : 25,
+    'capacity_per_strength' : 5,
+    'damage_growth_hours' : 24.0,
+    'damage_per_hour' : 6.0,
+    'damage_reduction_per_endurance' : 0.05,
+    'find_per_hour' : 1.0,
+    'find_bonus_per_perception' : 0.1,
+    'horizon_hours' : 72,
+    'luck_bonus' : 0.1,
+    'rarity_weights' : (0.8, 0.17, 0.03),
+    'rarity_values' : (1.0, 5.0, 25.0),
+    'return_ratio' : 0.5,
+    'stimpack_heal' : 50.0,
+}
+
+
+@instrument_class
+class ExpeditionForecaster(object):
+    '''
+    The ExpeditionForecaster class forecasts the Teams of a PyShelter
+    instance.
+    '''
+    def __init__(self, shelter=None, **parameters):
+        '''
+        Initializes the forecaster of the Teams of shelter. Any parameter of
+        PARAMETERS can be overridden.
+        '''
+        if shelter is None:
+            raise ValueError('The PyShelter instance must be provided.')
+        for name in parameters:
+            if name not in PARAMETERS:
+                raise ValueError("%s is not a parameter of the forecaster."   \
+                    % (name))
+
+        self.shelter = shelter
+        self.parameters = dict(PARAMETERS, **parameters)
+
+
+    def forecast(self, trials=1000, processes=None, seed=None):
+        '''
+        Returns the forecast of every Team, in the order of the expeditions
+        tree. See simulate_team for the content of each forecast.
+        '''
+        return simulate_teams([self.team_parameters(team) for team in         \
+            self.shelter.expeditions], trials, processes, seed)
+
+
+    def team_parameters(self, team=None):
+        '''
+        Returns the parameters of the simulation of a Team, as plain Python
+        values, so that they can be sent to other processes.
+        '''
+        if team is None:
+            raise ValueError('The Team must be provided.')
+        if not isinstance(team, dict):
+            raise TypeError("The Team must be provided as a dictionary, not " \
+                "%s." % (type(team).__name__))
+
+        parameters = self.parameters
+        dwellers = [self.shelter.dwellers[self.shelter.dweller_id_to_idx(     \
+            dweller_id)] for dweller_id in team['dwellers']]
+        equipment = team['teamEquipment']
+
+        special = lambda dweller, stat: dweller['stats']['stats'][stat]['value']
+        stimpacks_health = equipment.get('stimpacks', 0) *                    \
+            parameters['stimpack_heal'] / max(1, len(dwellers))
+
+        return {
+            'capacity' : max(0, sum(parameters['capacity_base'] +             \
+                parameters['capacity_per_strength'] * special(dweller,        \
+                STRENGTH) for dweller in dwellers) -                          \
+                len(equipment['inventory']['items'])),
+            'damage' : [parameters['damage_per_hour'] * max(0.0, 1.0 -        \
+                parameters['damage_reduction_per_endurance'] *                \
+                special(dweller, ENDURANCE)) for dweller in dwellers],
+            'damage_growth_hours' : parameters['damage_growth_hours'],
+            'elapsed_hours' : team.get('elapsedTimeAliveExploring', 0.0) /    \
+                3600.0,
+            'find' : [parameters['find_per_hour'] * (1.0 +                    \
+                parameters['find_bonus_per_perception'] * special(dweller,    \
+                PERCEPTION)) for dweller in dwellers],
+            'health' : [dweller['health']['healthValue'] + stimpacks_health   \
+                for dweller in dwellers],
+            'horizon_hours' : parameters['horizon_hours'],
+            'rarity' : self._rarity_distribution(sum(special(dweller, LUCK)   \
+                for dweller in dwellers)),
+            'rarity_values' : list(parameters['rarity_values']),
+            'return_ratio' : parameters['return_ratio'],
+        }
+
+
+    def _rarity_distribution(self, luck):
+        '''
+        Returns the probability of each rarity of RARITIES for a found item.
+        The weight of a rarity is scaled by the share of the catalogs having
+        that rarity, and Luck shifts the weights towards the rarer items.
+        '''
+        if not hasattr(self, '_catalog_shares'):
+            counts = [0] * len(RARITIES)
+            for catalog in ('junk', 'outfits', 'weapons'):
+                for static_data in load_static_data(catalog).values():
+                    rarity = static_data.get('rarity')
+                    rarity = 'normal' if rarity == 'common' else rarity
+                    if rarity in RARITIES:
+                        counts[RARITIES.index(rarity)] += 1
+            self._catalog_shares = [count / float(sum(counts))                \
+                for count in counts]
+
+        weights = [weight * share * (1.0 + self.parameters['luck_bonus'] *    \
+            luck) ** i for i, (weight, share) in enumerate(zip(               \
+            self.parameters['rarity_weights'], self._catalog_shares))]
+
+        return [weight / sum(weights) for weight in weights]
+
+
+def simulate_team(parameters, trials=1000, seed=None):
+    '''
+    Runs 'trials' simulations of a Team, described by the parameters returned
+    by ExpeditionForecaster.team_parameters, and returns:
+
+        capacity: the number of items the Team can still carry
+        death_probability: the probability a Dweller dies before returning
+        forced_return_probability: the probability the carry limit is hit
+            within the horizon
+        loot: the expected number of items brought back, by rarity
+        recall_hour: the hour, from now, maximizing the expected loot value
+            per hour of expedition, survival included
+        recall_value: the expected loot value when recalled at recall_hour
+        return_hours: the mean and the 10th, 50th and 90th percentiles of the
+            time, from now, the Team will be back in the Vault if left alone
+
+    Hours are counted from now, not from the start of the expedition.
+    '''
+    import numpy as np
+
+    random = np.random.default_rng(seed)
+    hours = int(parameters['horizon_hours'])
+    elapsed = parameters['elapsed_hours']
+    hour = np.arange(1, hours + 1)
+
+    # Items found, by trial and hour. Rarities are drawn independently of the
+    # number of items found, hence the expected loot of each rarity and its
+    # value follow from the number of items, without sampling them.
+    rarity = np.asarray(parameters['rarity'])
+    item_value = float(rarity.dot(parameters['rarity_values']))
+    items = random.poisson(sum(parameters['find']), size=(trials, hours))     \
+        .cumsum(axis=1)
+    carried = np.minimum(items, parameters['capacity'])
+
+    # Damage taken, by trial, hour and Dweller, with a standard deviation of
+    # half its mean. It grows with the time spent in the Wasteland.
+    growth = (1.0 + (elapsed + hour) / parameters['damage_growth_hours'])     \
+        .astype(np.float32)
+    mean = growth[None, :, None] * np.asarray(parameters['damage'],           \
+        dtype=np.float32)[None, None, :]
+    noise = random.standard_normal(size=(trials, hours,                       \
+        len(parameters['damage'])), dtype=np.float32)
+    damage = np.maximum(mean * (1.0 + noise / 2.0), 0.0).cumsum(axis=1)
+
+    full = items >= parameters['capacity']
+    dead = (damage >= np.asarray(parameters['health'], dtype=np.float32)      \
+        [None, None, :]).any(axis=2)
+    first_full = np.where(full.any(axis=1), full.argmax(axis=1) + 1,          \
+        hours + 1)
+    first_dead = np.where(dead.any(axis=1), dead.argmax(axis=1) + 1,          \
+        hours + 1)
+    stop = np.minimum(np.minimum(first_full, first_dead), hours)
+
+    # Loot brought back, the items exceeding the carry limit being dropped.
+    loot = carried[np.arange(trials), stop - 1].mean() * rarity
+
+    return_hours = stop + (elapsed + stop) * parameters['return_ratio']
+
+    # Expected value of the loot when recalled at each hour, per hour of the
+    # whole expedition, return trip included. A Team dead before being
+    # recalled brings nothing back.
+    recalled = np.minimum(hour[None, :], stop[:, None])
+    alive = first_dead[:, None] > recalled
+    value = (np.take_along_axis(carried, recalled - 1, axis=1) * alive)       \
+        .mean(axis=0) * item_value
+    rate = value / ((elapsed + hour) * (1.0 + parameters['return_ratio']))
+    recall = int(rate.argmax())
+
+    return {
+        'capacity' : parameters['capacity'],
+        'death_probability' : float((first_dead <= stop).mean()),
+        'forced_return_probability' : float(((first_full <= hours) &          \
+            (first_full < first_dead)).mean()),
+        'loot' : {name : float(count) for name, count in zip(RARITIES,        \
+            loot)},
+        'recall_hour' : recall + 1,
+        'recall_value' : float(value[recall]),
+        'return_hours' : {
+            'mean' : float(return_hours.mean()),
+            'p10' : float(np.percentile(return_hours, 10)),
+            'p50' : float(np.percentile(return_hours, 50)),
+            'p90' : float(np.percentile(return_hours, 90)),
+        },
+    }
+
+
+def simulate_teams(teams_parameters, trials=1000, processes=None, seed=None,
+    threshold=200000):
+    '''
+    Returns the forecasts of many Teams, possibly from different Vaults, in
+    order. When the batch holds more than 'threshold' trials overall, it is
+    split in chunks spread over 'processes' processes, by default one per CPU.
+    Each Team gets its own random stream derived from seed, so the forecasts
+    do not depend on how the batch is split.
+    '''
+    if not isinstance(trials, int):
+        raise TypeError("The number of trials must be provided as an int, "   \
+            "not %s." % (type(trials).__name__))
+    if trials < 1:
+        raise ValueError("The number of trials must be positive, not %s."     \
+            % (trials))
+
+    from numpy.random import SeedSequence
+
+    seeds = SeedSequence(seed).spawn(len(teams_parameters))
+    jobs = list(zip(teams_parameters, [trials] * len(teams_parameters), seeds))
+
+    if len(jobs) * trials <= threshold or processes == 1:
+        return [simulate_team(*job) for job in jobs]
+
+    from concurrent.futures import ProcessPoolExecutor
+    from os import cpu_count
+
+    processes = processes or cpu_count() or 1
+    chunksize = max(1, len(jobs) // (processes * 4))
+    with ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(_simulate_job, jobs, chunksize=chunksize))
+
+
+def _simulate_job(job):
+    '''
+    Runs simulate_team on a job (parameters, trials, seed) in a worker.
+    '''
+    return simulate_team(*job)
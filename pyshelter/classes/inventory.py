@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+
+'''
+The Inventory class is a compact representation of the items stored in the
+Vault, the 'items' key of the 'inventory' of the 'vault' top-level key. Late
+games hold tens of thousands of identical items, such as Duct Tapes, each a
+separate dictionary in the raw JSON.
+
+Items are interned twice. Their (type, id) pair is mapped to a small integer
+code, seeded from the static catalogs, which is used to look up their static
+data. Their whole content, attributes included, is mapped to a shape code.
+The inventory is then stored as runs of consecutive items sharing the same
+shape: two arrays hold the shape code and the length of each run. Only items
+whose attributes cannot be shared, such as pets carrying their own name and
+bonus, are kept as records of their own; their runs point to the record
+instead.
+
+The list of dictionaries the game expects is rebuilt only when needed, by
+calling to_list. Iterating over the inventory, or indexing it, returns
+read-only views of the items instead, as editing a copy rebuilt on the fly
+would be silently lost: items are edited by building a new Inventory.
+'''
+
+from array import array
+from collections import defaultdict
+from threading import RLock
+from types import MappingProxyType
+
+from pyshelter.utils.instrumentation import instrument_class
+from pyshelter.utils.io import load_static_data
+
+
+@instrument_class
+class Inventory(object):
+    '''
+    The Inventory class represents the items stored in the Vault, as runs of
+    interned items.
+    '''
+    # The shape code of the runs made of a single record.
+    RECORD = 0
+
+    # The catalog of each item type.
+    CATALOGS = (('Junk', 'junk'), ('Outfit', 'outfits'), ('Weapon', 'weapons'))
+
+    # Interned (type, id) pairs and shapes, shared by all the inventories.
+    # Lookups are lock-free: entries are appended to the lists before being
+    # published in the dictionaries, under the lock.
+    _interning = RLock()
+    _items = []
+    _items_to_code = {}
+    _rarities = []
+    _shapes = [None]
+    _shapes_to_code = {}
+    _shapes_to_item = array('I', [0])
+
+    def __init__(self, raw_data=None):
+        '''
+        Initializes the Inventory from the raw list of items.
+        '''
+        if raw_data is None:
+            raise ValueError('Inventory expects raw_data to be provided.')
+        if not isinstance(raw_data, list):
+            raise TypeError("Inventory expects raw_data as a list, not %s."   \
+                % (type(raw_data).__name__))
+
+        self._codes = array('I')
+        self._counts = array('I')
+        self._length = 0
+        self._records = []
+
+        for item in raw_data:
+            self._append(item)
+
+
+    def __getitem__(self, index):
+        '''
+        Returns a read-only view of the item at index.
+        '''
+        if not isinstance(index, int):
+            raise TypeError("Inventory indexes must be provided as an int, "  \
+                "not %s." % (type(index).__name__))
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('Inventory index out of range.')
+
+        for code, count in zip(self._codes, self._counts):
+            if code == self.RECORD:
+                if not index:
+                    return MappingProxyType(self._records[count])
+                index -= 1
+            elif index < count:
+                return MappingProxyType(dict(self._shapes[code]))
+            else:
+                index -= count
+
+
+    def __iter__(self):
+        '''
+        Iterates over the items, as read-only views. The items of a run share
+        the same view.
+        '''
+        shapes = self._shapes
+        for code, count in zip(self._codes, self._counts):
+            if code == self.RECORD:
+                yield MappingProxyType(self._records[count])
+                continue
+            view = MappingProxyType(dict(shapes[code]))
+            for _ in range(count):
+                yield view
+
+
+    def __len__(self):
+        '''
+        Returns the number of items.
+        '''
+        return self._length
+
+
+    def append(self, item=None):
+        '''
+        Appends an item, extending the last run if it shares its shape.
+        '''
+        if item is None:
+            raise ValueError('The item to append must be provided.')
+        if not isinstance(item, (dict, MappingProxyType)):
+            raise TypeError("The item to append must be provided as a "       \
+                "dictionary, not %s." % (type(item).__name__))
+
+        self._append(item)
+
+
+    def compact(self):
+        '''
+        Returns a new Inventory holding the same items sorted by ID, the order
+        the game keeps them in, so that all the identical items form a single
+        run.
+        '''
+        runs = sorted(self._runs(), key=lambda run: run[0]['id'])
+
+        inventory = Inventory([])
+        for item, code, count in runs:
+            inventory._extend(item, code, count)
+
+        return inventory
+
+
+    def count_by_item(self):
+        '''
+        Returns the number of items, by (type, id).
+        '''
+        counts = defaultdict(int)
+        for item_code, code, count, record in self._item_runs():
+            counts[self._items[item_code]] += count
+
+        return dict(counts)
+
+
+    def count_by_rarity(self):
+        '''
+        Returns the number of items, by rarity. Items missing from the static
+        catalogs, such as pets, are counted under None.
+        '''
+        counts = defaultdict(int)
+        for item_code, code, count, record in self._item_runs():
+            counts[self._rarities[item_code]] += count
+
+        return dict(counts)
+
+
+    def drop_junk(self, thr_norm=30, thr_rare=40, thr_legend=50):
+        '''
+        Returns a new Inventory without the excess junk, based on its quality.
+        Just like PyShelter.drop_vault_inventory_junk, which it mirrors, it
+        expects the Inventory to be sorted and keeps, for each Junk ID, its
+        first items until the threshold of its rarity is exceeded. Items that
+        are not Junk are all kept; Junk missing from the static catalog raises
+        a KeyError.
+        '''
+        thresholds = {'legendary' : thr_legend, 'normal' : thr_norm,          \
+            'rare' : thr_rare}
+
+        inventory = Inventory([])
+        current_code = None
+        item_count = 0
+
+        for item_code, code, count, record in self._item_runs():
+
+            item_type, item_id = self._items[item_code]
+            if item_type != 'Junk':
+                inventory._extend(record, code, count)
+                continue
+
+            if item_code != current_code:
+                current_code = item_code
+                item_count = 0
+
+            rarity = self._rarities[item_code]
+            if rarity is None:
+                raise KeyError(item_id)
+
+            threshold = thresholds.get(rarity)
+            if threshold is not None:
+                inventory._extend(record, code,                               \
+                    max(0, min(count, threshold + 1 - item_count)))
+
+            item_count += count
+
+        return inventory
+
+
+    def to_list(self):
+        '''
+        Returns the items as the list of dictionaries the game expects, each
+        rebuilt as a new dictionary. Records are returned as they are.
+        '''
+        items = []
+        for item, code, count in self._runs():
+            items.append(item)
+            for _ in range(count - 1):
+                items.append(dict(item))
+
+        return items
+
+
+    def _append(self, item):
+        '''
+        Appends an item, without validating it. Records given as read-only
+        views are stored as dictionaries.
+        '''
+        code = self._shape_code(item)
+        if code == self.RECORD:
+            self._codes.append(self.RECORD)
+            self._counts.append(len(self._records))
+            self._records.append(item if isinstance(item, dict) else          \
+                dict(item))
+        elif self._codes and self._codes[-1] == code:
+            self._counts[-1] += 1
+        else:
+            self._codes.append(code)
+            self._counts.append(1)
+        self._length += 1
+
+
+    def _extend(self, item, code, count):
+        '''
+        Appends count items of the given shape code. Records are appended one
+        at a time.
+        '''
+        if not count:
+            return
+        if code == self.RECORD:
+            self._append(item)
+        elif self._codes and self._codes[-1] == code:
+            self._counts[-1] += count
+            self._length += count
+        else:
+            self._codes.append(code)
+            self._counts.append(count)
+            self._length += count
+
+
+    @classmethod
+    def _item_code(cls, item):
+        '''
+        Returns the code of the (type, id) pair of an item, interning it if it
+        is not part of the static catalogs.
+        '''
+        key = (item.get('type'), item.get('id'))
+        try:
+            return cls._items_to_code[key]
+        except KeyError:
+            pass
+
+        with cls._interning:
+            if not cls._items:
+                for item_type, catalog in cls.CATALOGS:
+                    for item_id, static_data in sorted(                       \
+                        load_static_data(catalog).items(),                    \
+                        key=lambda entry: str(entry[0])):
+                        cls._items.append((item_type, item_id))
+                        cls._rarities.append(static_data.get('rarity'))
+                        cls._items_to_code[(item_type, item_id)] =            \
+                            len(cls._items) - 1
+
+            if key not in cls._items_to_code:
+                cls._items.append(key)
+                cls._rarities.append(None)
+                cls._items_to_code[key] = len(cls._items) - 1
+
+            return cls._items_to_code[key]
+
+
+    def _item_runs(self):
+        '''
+        Iterates over the runs, as (item code, shape code, count, record),
+        without rebuilding their items. The record is None, unless the run is
+        made of one.
+        '''
+        shapes_to_item = self._shapes_to_item
+        for code, count in zip(self._codes, self._counts):
+            if code == self.RECORD:
+                record = self._records[count]
+                yield self._item_code(record), code, 1, record
+            else:
+                yield shapes_to_item[code], code, count, None
+
+
+    def _runs(self):
+        '''
+        Iterates over the runs, as (item, shape code, count). The item is the
+        shared shape of the run, as a dictionary, or the record itself.
+        '''
+        shapes = self._shapes
+        for code, count in zip(self._codes, self._counts):
+            if code == self.RECORD:
+                yield self._records[count], code, 1
+            else:
+                yield dict(shapes[code]), code, count
+
+
+    @classmethod
+    def _shape_code(cls, item):
+        '''
+        Returns the shape code of an item, interning it on first sight. Items
+        holding unhashable attributes cannot share a shape and are returned
+        the RECORD code. The types of the values are part of the key, as True,
+        1 and 1.0 are equal but not serialized the same way.
+        '''
+        shape = tuple(item.items())
+        key = (shape, tuple(map(type, item.values())))
+        try:
+            return cls._shapes_to_code[key]
+        except KeyError:
+            pass
+        except TypeError:
+            return cls.RECORD
+
+        with cls._interning:
+            if key not in cls._shapes_to_code:
+                item_code = cls._item_code(item)
+                cls._shapes.append(shape)
+                cls._shapes_to_item.append(item_code)
+                cls._shapes_to_code[key] = len(cls._shapes) - 1
+
+            return cls._shapes_to_code[key]
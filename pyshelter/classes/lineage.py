@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+'''
+The Lineage class indexes the family relations of the Dwellers, so that
+whether two of them are related can be answered in constant time. Each Dweller
+references its ascendants, parents and grandparents, through the key
+'ascendants' of its 'relations', -1 marking unknown ones.
+
+Every Dweller, as well as every ascendant no longer living in the Vault, is
+given a bit. The family of a Dweller is the bitset of itself and its
+ascendants: two Dwellers are related, and cannot be paired, if their families
+intersect. This covers parents, grandparents, siblings, half-siblings, aunts,
+uncles and cousins, i.e. all the relations the game records.
+'''
+
+from pyshelter.utils.instrumentation import instrument_class
+
+
+# Values of the 'gender' key of a Dweller.
+FEMALE, MALE = 1, 2
+
+
+@instrument_class
+class Lineage(object):
+    '''
+    The Lineage class represents the family relations of the Dwellers, as
+    bitsets.
+    '''
+    def __init__(self, dwellers=None):
+        '''
+        Initializes the Lineage of the given Dwellers.
+        '''
+        if dwellers is None:
+            raise ValueError('Lineage expects the Dwellers to be provided.')
+        if not isinstance(dwellers, list):
+            raise TypeError("Lineage expects the Dwellers as a list, not %s." \
+                % (type(dwellers).__name__))
+
+        self._bits = {}
+        self._families = {}
+        self._genders = {}
+
+        for dweller in dwellers:
+            self._add(dweller)
+
+
+    def __contains__(self, dweller_id):
+        '''
+        Returns whether a Dweller is part of the Lineage.
+        '''
+        return dweller_id in self._families
+
+
+    def __len__(self):
+        '''
+        Returns the number of Dwellers part of the Lineage.
+        '''
+        return len(self._families)
+
+
+    def add(self, dweller=None):
+        '''
+        Adds a Dweller, newborn or recruited, to the Lineage.
+        '''
+        if dweller is None:
+            raise ValueError('The Dweller to add must be provided.')
+        if not isinstance(dweller, dict):
+            raise TypeError("The Dweller to add must be provided as a "       \
+                "dictionary, not %s." % (type(dweller).__name__))
+
+        self._add(dweller)
+
+
+    def eligible_pairs(self, dweller_ids=None):
+        '''
+        Returns all the (female, male) pairs of unrelated Dwellers among the
+        given IDs, e.g. the 'dwellers' of a room. Dwellers unknown to the
+        Lineage are ignored.
+        '''
+        if dweller_ids is None:
+            raise ValueError('The IDs of the Dwellers must be provided.')
+
+        females = []
+        males = []
+        for dweller_id in dweller_ids:
+            if dweller_id not in self._families:
+                continue
+            if self._genders[dweller_id] == FEMALE:
+                females.append((dweller_id, self._families[dweller_id]))
+            elif self._genders[dweller_id] == MALE:
+                males.append((dweller_id, self._families[dweller_id]))
+
+        return [(female, male) for male, male_family in males                 \
+            for female, female_family in females                              \
+            if not female_family & male_family]
+
+
+    def partners(self, dweller_id=None):
+        '''
+        Returns the IDs of all the Dwellers of the opposite gender a Dweller
+        can be paired with.
+        '''
+        if dweller_id is None:
+            raise ValueError('The Dweller unique ID is expected.')
+        if not isinstance(dweller_id, int):
+            raise TypeError("The Dweller ID is expected as an int, not %s."   \
+                % (type(dweller_id).__name__))
+
+        family = self._families[dweller_id]
+        gender = self._genders[dweller_id]
+
+        return [partner for partner, partner_family in self._families.items() \
+            if self._genders[partner] != gender and                           \
+            not family & partner_family]
+
+
+    def related(self, dweller_id=None, other_id=None):
+        '''
+        Returns whether two Dwellers, given their unique IDs, are related.
+        '''
+        if dweller_id is None or other_id is None:
+            raise ValueError('The unique IDs of both Dwellers are expected.')
+
+        try:
+            return bool(self._families[dweller_id] & self._families[other_id])
+        except KeyError as e:
+            print("There is no Dweller with ID %s." % (e.args[0]))
+            raise
+
+
+    def remove(self, dweller_id=None):
+        '''
+        Removes a Dweller, dead or evicted, from the Lineage. Its bit is kept,
+        as it remains the ascendant of its descendants.
+        '''
+        if dweller_id is None:
+            raise ValueError('The Dweller unique ID is expected.')
+
+        try:
+            del self._families[dweller_id]
+            del self._genders[dweller_id]
+        except KeyError:
+            print("There is no Dweller with ID %s." % (dweller_id))
+            raise
+
+
+    def update(self, dwellers=None):
+        '''
+        Reconciles the Lineage with the given Dwellers: adds those not yet
+        part of it, e.g. born or recruited since it was built, and removes
+        those no longer among them. Returns the number of Dwellers added and
+        removed.
+        '''
+        if dwellers is None:
+            raise ValueError('The Dwellers must be provided.')
+
+        dweller_ids = set()
+        added = 0
+        for dweller in dwellers:
+            dweller_ids.add(dweller['serializeId'])
+            if dweller['serializeId'] not in self._families:
+                self._add(dweller)
+                added += 1
+
+        removed = [dweller_id for dweller_id in self._families                \
+            if dweller_id not in dweller_ids]
+        for dweller_id in removed:
+            self.remove(dweller_id)
+
+        return added + len(removed)
+
+
+    def _add(self, dweller):
+        '''
+        Computes the family bitset of a Dweller.
+        '''
+        family = 1 << self._bit(dweller['serializeId'])
+        for ascendant in dweller.get('relations', {}).get('ascendants', ()):
+            if ascendant >= 0:
+                family |= 1 << self._bit(ascendant)
+
+        self._families[dweller['serializeId']] = family
+        self._genders[dweller['serializeId']] = dweller.get('gender')
+
+
+    def _bit(self, dweller_id):
+        '''
+        Returns the bit of a Dweller or ascendant, assigning it on first sight.
+        '''
+        try:
+            return self._bits[dweller_id]
+        except KeyError:
+            self._bits[dweller_id] = len(self._bits)
+            return self._bits[dweller_id]
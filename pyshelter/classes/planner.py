@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+'''
+The RoomPlanner class plans which rooms of the Vault to upgrade or merge,
+within a budget of caps, to maximize the production of the Vault.
+
+The static data of the rooms provides, for each producing room type, its
+output by merge level (1 to 3, the number of merged rooms) and upgrade level
+(1 to 3). Upgrading a room increases its level; merging a room with a newly
+built adjacent one increases its merge level. The costs of both actions are
+not part of the static data, hence they are parameters of the planner:
+
+    build: the cost of building one room, i.e. one merge
+    upgrade: the cost of upgrading one room from level 1 to 2 and 2 to 3;
+        a merged room pays it once per room it is made of
+
+A room built to be merged must first be upgraded to the level of the room it
+is merged with. Under these rules, the cost of bringing a room from one state
+(merge level, level) to another does not depend on the order of the actions.
+
+For each room, every reachable state is an option, scored by its production
+gain and cost. The scores only depend on the type and state of the room and
+are cached, so that planning again after a change only scores the rooms that
+changed. The options are selected either exactly, as a multiple-choice
+knapsack solved by dynamic programming over the budget, or greedily, taking
+the next action with the best gain per cap from a priority queue.
+
+Whether there is room to build next to a room is not known from the save: by
+default, every room below merge level 3 is considered mergeable.
+'''
+
+from heapq import heappop, heappush
+from math import gcd
+
+from pyshelter.utils.instrumentation import instrument_class
+from pyshelter.utils.io import load_static_data
+
+
+COSTS = {
+    'build' : 100,
+    'upgrade' : (500, 1500),
+}
+
+MAX_LEVEL = 3
+
+
+@instrument_class
+class RoomPlanner(object):
+    '''
+    The RoomPlanner class plans the upgrades and merges of the rooms of the
+    Vault within a budget.
+    '''
+    def __init__(self, rooms=None, costs=None, can_merge=None):
+        '''
+        Initializes the planner of the given rooms. costs overrides COSTS;
+        can_merge, if provided, is called with a room and returns whether it
+        can be merged.
+        '''
+        if rooms is None:
+            raise ValueError('The rooms must be provided.')
+        if not isinstance(rooms, list):
+            raise TypeError("The rooms must be provided as a list, not %s."   \
+                % (type(rooms).__name__))
+
+        self.rooms = rooms
+        self.costs = dict(COSTS, **(costs or {}))
+        self.can_merge = can_merge if can_merge is not None else              \
+            lambda room: True
+
+        self._options = {}
+        self._rooms_options = {}
+
+
+    def plan(self, budget=None, solver='dp'):
+        '''
+        Returns the ordered list of actions to perform within budget, given
+        in caps or as the Resources of the Vault. Each action is a dictionary:
+
+            {action, deserializeID, type, cost, gain, mergeLevel, level}
+
+        where mergeLevel and level are the state of the room after the action.
+        The solver is either 'dp', exact, or 'greedy', faster on large
+        budgets.
+        '''
+        if budget is None:
+            raise ValueError('The budget must be provided.')
+        if hasattr(budget, 'caps'):
+            budget = budget.caps
+        if isinstance(budget, bool):
+            raise ValueError("The budget must be a number of caps, not %s."   \
+                % (budget))
+        if not isinstance(budget, (int, float)):
+            raise TypeError("The budget must be provided as a number or as "  \
+                "Resources, not %s." % (type(budget).__name__))
+        if not 0 <= budget < float('inf'):
+            raise ValueError("The budget must be a finite, non-negative "     \
+                "number of caps, not %s." % (budget))
+        if solver not in ('dp', 'greedy'):
+            raise ValueError("The solver must be either 'dp' or 'greedy', "   \
+                "not %s." % (solver))
+
+        rooms_options = [(room, self.room_options(room)) for room in          \
+            self.rooms]
+        rooms_options = [(room, options) for room, options in rooms_options   \
+            if options]
+
+        if solver == 'dp':
+            targets = self._solve_dp(rooms_options, int(budget))
+        else:
+            targets = self._solve_greedy(rooms_options, int(budget))
+
+        return self._actions(targets)
+
+
+    def room_options(self, room=None):
+        '''
+        Returns the states a room can be brought to, as a list of (mergeLevel,
+        level, cost, gain), the current state excluded. Rooms that do not
+        produce have no options.
+        '''
+        if room is None:
+            raise ValueError('The room must be provided.')
+
+        # Whether the room can be merged depends on its neighbours, hence it
+        # is part of the state the options are cached for.
+        state = (room['type'], room['mergeLevel'], room['level'],             \
+            room['mergeLevel'] < MAX_LEVEL and self.can_merge(room))
+        cached = self._rooms_options.get(room['deserializeID'])
+        if cached is None or cached[0] != state:
+            if state not in self._options:
+                self._options[state] = self._score(*state)
+            cached = (state, self._options[state])
+            self._rooms_options[room['deserializeID']] = cached
+
+        return cached[1]
+
+
+    def _actions(self, targets):
+        '''
+        Turns the target state of each room into single upgrades and merges,
+        ordered by gain per cap, best first. The actions on a same room are
+        kept in their order: merges first, then upgrades.
+        '''
+        queue = []
+        for room, merge_level, level in targets:
+            steps = self._steps(room, merge_level, level)
+            if steps:
+                heappush(queue, (-steps[0]['gain'] / max(1, steps[0]['cost']),\
+                    room['deserializeID'], steps))
+
+        actions = []
+        while queue:
+            _, deserialize_id, steps = heappop(queue)
+            actions.append(steps.pop(0))
+            if steps:
+                heappush(queue, (-steps[0]['gain'] / max(1, steps[0]['cost']),\
+                    deserialize_id, steps))
+
+        return actions
+
+
+    def _cost(self, merge_level, level, target_merge_level, target_level):
+        '''
+        Returns the cost of bringing a room from (merge_level, level) to
+        (target_merge_level, target_level): merges at the current level, then
+        upgrades at the final merge level.
+        '''
+        upgrades = self.costs['upgrade']
+        merges = (target_merge_level - merge_level) * (self.costs['build'] +  \
+            sum(upgrades[:level - 1]))
+        return merges + target_merge_level * sum(upgrades[level - 1:          \
+            target_level - 1])
+
+
+    def _options_from(self, room, merge_level, level):
+        '''
+        Returns the options of a room as if it were in the given state.
+        '''
+        state = (room['type'], merge_level, level,                            \
+            merge_level < MAX_LEVEL and self.can_merge(room))
+        if state not in self._options:
+            self._options[state] = self._score(*state)
+        return self._options[state]
+
+
+    def _output(self, room_type, merge_level, level):
+        '''
+        Returns the output of a room, or None if it does not produce.
+        '''
+        output = load_static_data('rooms').get(room_type, {}).get('output')
+        if output is None:
+            return None
+        return output[merge_level - 1][level - 1]
+
+
+    def _score(self, room_type, merge_level, level, mergeable):
+        '''
+        Returns the options of a room of the given type and state.
+        '''
+        output = self._output(room_type, merge_level, level)
+        if output is None:
+            return []
+
+        max_merge_level = MAX_LEVEL if mergeable else merge_level
+        return [(target_merge_level, target_level,                            \
+            self._cost(merge_level, level, target_merge_level, target_level), \
+            self._output(room_type, target_merge_level, target_level) -       \
+            output)                                                           \
+            for target_merge_level in range(merge_level, max_merge_level + 1) \
+            for target_level in range(level, MAX_LEVEL + 1)                   \
+            if (target_merge_level, target_level) != (merge_level, level)]
+
+
+    def _solve_dp(self, rooms_options, budget):
+        '''
+        Selects at most one option per room, maximizing the overall gain
+        within budget, as a multiple-choice knapsack. Costs are scaled down by
+        their greatest common divisor to keep the table small.
+        '''
+        unit = 0
+        for room, options in rooms_options:
+            for option in options:
+                unit = gcd(unit, option[2])
+        unit = unit or 1
+        capacity = budget // unit
+
+        best = [0] * (capacity + 1)
+        choices = []
+        for room, options in rooms_options:
+            current = list(best)
+            choice = [None] * (capacity + 1)
+            for i, (_, _, cost, gain) in enumerate(options):
+                cost //= unit
+                for spent in range(cost, capacity + 1):
+                    candidate = best[spent - cost] + gain
+                    if candidate > current[spent]:
+                        current[spent] = candidate
+                        choice[spent] = i
+            choices.append(choice)
+            best = current
+
+        targets = []
+        spent = capacity
+        for (room, options), choice in reversed(list(zip(rooms_options,       \
+            choices))):
+            if choice[spent] is not None:
+                merge_level, level, cost, _ = options[choice[spent]]
+                targets.append((room, merge_level, level))
+                spent -= cost // unit
+
+        return targets
+
+
+    def _solve_greedy(self, rooms_options, budget):
+        '''
+        Selects single actions by best gain per cap, as long as they fit in
+        the budget. After each action, the next actions of the same room are
+        pushed to the priority queue.
+        '''
+        states = {}
+        queue = []
+
+        def push(room, merge_level, level):
+            options = {(option[0], option[1]) : option for option in          \
+                self._options_from(room, merge_level, level)}
+            for step in ((merge_level + 1, level), (merge_level, level + 1)):
+                if step in options:
+                    _, _, cost, gain = options[step]
+                    heappush(queue, (-gain / max(1, cost), cost,              \
+                        room['deserializeID'], step, room))
+
+        for room, options in rooms_options:
+            states[room['deserializeID']] = (room['mergeLevel'],              \
+                room['level'])
+            push(room, room['mergeLevel'], room['level'])
+
+        while queue:
+            _, cost, deserialize_id, step, room = heappop(queue)
+            if cost > budget:
+                continue
+            if self._step_from(states[deserialize_id], step) is None:
+                continue
+            budget -= cost
+            states[deserialize_id] = step
+            push(room, *step)
+
+        return [(room, states[room['deserializeID']][0],                      \
+            states[room['deserializeID']][1]) for room, _ in rooms_options    \
+            if states[room['deserializeID']] !=                               \
+            (room['mergeLevel'], room['level'])]
+
+
+    def _step_from(self, state, step):
+        '''
+        Returns step if it is a single action away from state, None otherwise.
+        '''
+        if (step[0] - state[0]) + (step[1] - state[1]) == 1:
+            return step
+        return None
+
+
+    def _steps(self, room, merge_level, level):
+        '''
+        Returns the single actions bringing a room to the target state, merges
+        first.
+        '''
+        steps = []
+        current = (room['mergeLevel'], room['level'])
+        targets = [(m, current[1]) for m in range(current[0] + 1,             \
+            merge_level + 1)] + [(merge_level, l) for l in range(             \
+            current[1] + 1, level + 1)]
+
+        for target in targets:
+            steps.append({
+                'action' : 'merge' if target[0] != current[0] else 'upgrade',
+                'cost' : self._cost(current[0], current[1], *target),
+                'deserializeID' : room['deserializeID'],
+                'gain' : self._output(room['type'], *target) -                \
+                    self._output(room['type'], *current),
+                'level' : target[1],
+                'mergeLevel' : target[0],
+                'type' : room['type'],
+            })
+            current = target
+
+        return steps
@@ -7,50 +7,96 @@ represent the game data.
 '''
 
 from collections import defaultdict
-from json import dump, loads
-from pprint import pprint as pp
 
+from pyshelter.classes.inventory import Inventory
+from pyshelter.classes.resources import Resources
+from pyshelter.classes.vault import Vault
+from pyshelter.utils.instrumentation import instrument_class
 from pyshelter.utils.io import load_static_data
+from pyshelter.utils.journal import Journal
+from pyshelter.utils.json_codecs import get_codec
 
 
+@instrument_class
 class PyShelter(object):
     '''
     The PyShelter class represents the interface to a saved Fallout Shelter
     game.
     '''
-    def __init__(self, f_in=None):
+    def __init__(self, f_in=None, codec=None):
         '''
         Initializes a PyShelter instance. The class has a root which allows to
         control the whole JSON. All the top-level keys are first turned into
         dummies, which are merely references to subsections of the root, then,
-        if needed, initialized as real class instances.
+        if needed, initialized as real class instances. The JSON is loaded and
+        saved through codec, by default the fastest available. All the edits
+        are recorded by the journal, so that they can be undone.
         '''
+        self.codec = codec
+        self.journal = Journal()
+        self.journal.subscribe(self._drop_caches)
         self.root = f_in
         #self.resources = self.root["vault"]["storage"]["resources"]
         #self.vault = self.root['vault']
 
-        self.sd = {
-            'Junk' : load_static_data('junk'),
-            'Outfit' : load_static_data('outfits'),
-            'Weapon' : load_static_data('weapons')
-        }
+
+    @property
+    def codec(self):
+        '''
+        Returns the codec used to load and save the JSON.
+        '''
+        return self._codec
+
+
+    @codec.setter
+    def codec(self, value=None):
+        '''
+        Updates the codec used to load and save the JSON. It can be provided
+        either as the name of a backend or as a codec instance. If no codec is
+        provided, the fastest one available is used.
+        '''
+        if value is None or isinstance(value, str):
+            value = get_codec(value)
+        if not callable(getattr(value, 'dumps', None)) or                     \
+            not callable(getattr(value, 'loads', None)):
+            raise TypeError("The codec must provide the dumps and loads "     \
+                "methods, %s does not." % (type(value).__name__))
+        if not getattr(value, 'byte_exact', False):
+            raise ValueError("The codec %s is not byte-exact with the "       \
+                "standard library." % (type(value).__name__))
+        self._codec = value
+
+
+    def compact_inventory(self):
+        '''
+        Replaces the inventory tree with its compact representation, sorted,
+        and returns it. The list of items the game expects is rebuilt only
+        when writing back the JSON. From then on, the items of the inventory
+        are read-only views: they are edited by assigning a new inventory.
+        '''
+        if not isinstance(self.inventory, Inventory):
+            self.inventory = Inventory(self.inventory)
+
+        return self.inventory
 
 
     def drop_expeditions_nornmal_loot(self, quality='normal'):
         '''
         Drops all normal loot collected during Expeditions.
         '''
-        for expedition in self.expeditions:
+        with self.journal.transaction():
+            for expedition in self.expeditions:
 
-            loot_to_keep = []
+                loot_to_keep = []
 
-            for item in expedition['teamEquipment']['inventory']['items']:
-                if self.sd[item['type']][item['id']]['rarity'] not in \
-                ('common', 'normal'):
-                    loot_to_keep.append(item)
-                    continue
+                for item in expedition['teamEquipment']['inventory']['items']:
+                    if self.sd[item['type']][item['id']]['rarity'] not in \
+                    ('common', 'normal'):
+                        loot_to_keep.append(item)
+                        continue
 
-            expedition['teamEquipment']['inventory']['items'] = loot_to_keep
+                self.journal.assign(expedition['teamEquipment']['inventory'], \
+                    'items', loot_to_keep)
 
 
     def drop_vault_inventory_junk(self, thr_norm=30, thr_rare=40, thr_legend=50):
@@ -60,7 +106,13 @@ class PyShelter(object):
         quantity. Items are kept until the conditions are true for a given
         item.
         '''
+        if isinstance(self.inventory, Inventory):
+            self.journal.assign(self.root["vault"]["inventory"], 'items',     \
+                self.inventory.drop_junk(thr_norm, thr_rare, thr_legend))
+            return
+
         items_to_keep = []
+        junk = self.sd['Junk']
         
         item_id = None
         item_count = 0
@@ -75,21 +127,22 @@ class PyShelter(object):
                 item_id = item.get('id')
                 item_count = 0
 
-            if self.sd['Junk'][item['id']]['rarity'] == 'normal':
+            if junk[item['id']]['rarity'] == 'normal':
                 if item_count <= thr_norm:
                     items_to_keep.append(item)
 
-            elif self.sd['Junk'][item['id']]['rarity'] == 'rare':
+            elif junk[item['id']]['rarity'] == 'rare':
                 if item_count <= thr_rare:
                     items_to_keep.append(item)
 
-            elif self.sd['Junk'][item['id']]['rarity'] == 'legendary':
+            elif junk[item['id']]['rarity'] == 'legendary':
                 if item_count <= thr_legend:
                     items_to_keep.append(item)
 
             item_count += 1
 
-        self.root["vault"]["inventory"]['items'] = items_to_keep
+        self.journal.assign(self.root["vault"]["inventory"], 'items',         \
+            items_to_keep)
 
 
     def dweller_id_to_idx(self, dweller_id=None):
@@ -123,9 +176,10 @@ class PyShelter(object):
     @dwellers.setter
     def dwellers(self, value):
         '''
-        Updates the dwellers tree.
+        Updates the dwellers tree, dropping the index of their IDs.
         '''
-        self.root['dwellers']['dwellers'] = value
+        self.journal.assign(self.root['dwellers'], 'dwellers', value)
+        self.__dict__.pop('_ids_to_index', None)
 
 
     def dwellers_to_retrain(self, cutoff=85.0):
@@ -169,6 +223,18 @@ class PyShelter(object):
         return dwellers_to_retrain
 
 
+    def dwellers_view(self):
+        '''
+        Returns the Dwellers of the dwellers tree, recording their edits in
+        the journal, so that they join transactions and can be undone. The
+        Dwellers list the Dwellers at the time of the call: it must be called
+        again once the dwellers tree is replaced.
+        '''
+        from pyshelter.classes.dwellers import Dwellers
+
+        return Dwellers(self.dwellers, self.journal)
+
+
     @property
     def expeditions(self):
         '''
@@ -182,13 +248,24 @@ class PyShelter(object):
         '''
         Updates the expeditions tree.
         '''
-        self.root['vault']['wasteland']['teams'] = value
+        self.journal.assign(self.root['vault']['wasteland'], 'teams', value)
+
+
+    def expeditions_view(self):
+        '''
+        Returns the Expeditions of the expeditions tree, recording their edits
+        in the journal, as for the Dwellers.
+        '''
+        from pyshelter.classes.expeditions import Expeditions
+
+        return Expeditions(self.expeditions, self.journal)
 
 
     @property
     def inventory(self):
         '''
-        Returns the inventory tree.
+        Returns the inventory tree: the list of items or, once compacted, the
+        Inventory, whose items are read-only.
         '''
         return self.root["vault"]["inventory"]['items']
 
@@ -196,10 +273,26 @@ class PyShelter(object):
     @inventory.setter
     def inventory(self, value):
         '''
-        Updates the inventory tree.
+        Updates the inventory tree, sorted by ID. Its compact representation is
+        kept as such, and so is the compact inventory the items replace.
+        '''
+        if not isinstance(value, Inventory) and                               \
+            isinstance(self.inventory, Inventory):
+            value = Inventory(list(value))
+        if isinstance(value, Inventory):
+            self.journal.assign(self.root["vault"]["inventory"], 'items',     \
+                value.compact())
+            return
+
+        self.journal.assign(self.root["vault"]["inventory"], 'items',         \
+            sorted(value, key=lambda x:x['id']))
+
+
+    def redo(self):
+        '''
+        Applies again the last edit undone.
         '''
-        self.root["vault"]["inventory"]['items'] = value
-        self.root["vault"]["inventory"]['items'].sort(key=lambda x:x['id'])
+        self.journal.redo()
 
 
     def reset_dweller(self, dweller_index):
@@ -207,21 +300,23 @@ class PyShelter(object):
         Resets a Dweller's experience and health to level 1, given its index.
         '''
         try:
-            self.dwellers[dweller_index]["experience"] = {
-                "accum": 0,
-                "currentLevel": 1,
-                "experienceValue": 605.0,
-                "needLvUp": False,
-                "storage": 0,
-                "wastelandExperience": 0
-            }
-            self.dwellers[dweller_index]["health"] = {
-                "healthValue": 105.0,
-                "lastLevelUpdated": 1,
-                "maxHealth": 105.0,
-                "permaDeath": False,
-                "radiationValue": 0.0
-            }
+            dweller = self.dwellers[dweller_index]
+            with self.journal.transaction():
+                self.journal.assign(dweller, "experience", {
+                    "accum": 0,
+                    "currentLevel": 1,
+                    "experienceValue": 605.0,
+                    "needLvUp": False,
+                    "storage": 0,
+                    "wastelandExperience": 0
+                })
+                self.journal.assign(dweller, "health", {
+                    "healthValue": 105.0,
+                    "lastLevelUpdated": 1,
+                    "maxHealth": 105.0,
+                    "permaDeath": False,
+                    "radiationValue": 0.0
+                })
         except IndexError as e:
             print("There is no Dweller with ID %s." % (dweller_index))
             raise
@@ -259,9 +354,40 @@ class PyShelter(object):
         '''
         if value is None:
             raise ValueError('An input file must be provided.')
-        
-        with open(value) as f_input_file:
-            self._root = loads(f_input_file.read())
+
+        with open(value, 'rb') as f_input_file:
+            self._root = self.codec.loads(f_input_file.read())
+
+
+    @property
+    def sd(self):
+        '''
+        Lazily returns the static data of the items, by item type. The catalogs
+        are only loaded the first time they are needed.
+        '''
+        if not hasattr(self, '_sd'):
+            self._sd = {
+                'Junk' : load_static_data('junk'),
+                'Outfit' : load_static_data('outfits'),
+                'Weapon' : load_static_data('weapons')
+            }
+
+        return self._sd
+
+
+    def to_dict(self):
+        '''
+        Returns the data as the game expects it. A compact inventory is
+        expanded back to the list of items, without altering the root.
+        '''
+        root = self.root
+        if isinstance(self.inventory, Inventory):
+            root = dict(root)
+            root['vault'] = dict(root['vault'])
+            root['vault']['inventory'] = dict(root['vault']['inventory'])
+            root['vault']['inventory']['items'] = self.inventory.to_list()
+
+        return root
 
 
     def to_json(self, output_file=None):
@@ -269,7 +395,26 @@ class PyShelter(object):
         Writes back the data to the original JSON.
         '''
         with open(output_file, 'w') as f_output_file:
-            dump(self.root, f_output_file)
+            f_output_file.write(self.codec.dumps(self.to_dict()))
+
+
+    def transaction(self):
+        '''
+        Returns a context grouping all the edits made within it into a single
+        one, committed all at once or rolled back if an exception is raised.
+
+            with shelter.transaction():
+                shelter.reset_dweller(0)
+                shelter.drop_vault_inventory_junk()
+        '''
+        return self.journal.transaction()
+
+
+    def undo(self):
+        '''
+        Reverts the last edit, or the last transaction as a whole.
+        '''
+        self.journal.undo()
 
 
     @property
@@ -285,4 +430,15 @@ class PyShelter(object):
         '''
         Updates the vault tree.
         '''
-        self._vault = Vault(value)
\ No newline at end of file
+        self._vault = Vault(value)
+
+    def _drop_caches(self, entries):
+        '''
+        Drops the index of the Dweller IDs when the edits committed, undone,
+        redone or rolled back by the journal touch the dwellers tree, as the
+        setter does when it is assigned.
+        '''
+        containers = (self.root, self.root['dwellers'])
+        if any(container is tree for container, _, _, _ in entries           \
+            for tree in containers):
+            self.__dict__.pop('_ids_to_index', None)
@@ -12,12 +12,12 @@ friendly room name which also reveals its relative location.
 '''
 
 from collections import defaultdict
-from pprint import pprint as pp
-from string import ascii_uppercase
 
+from pyshelter.utils.instrumentation import instrument_class
 from pyshelter.utils.io import load_static_data
 
 
+@instrument_class
 class Rooms(list):
     '''
     The Rooms class represents all the rooms of the Vault. They are stored as a
@@ -82,6 +82,8 @@ class Rooms(list):
         '''
         if not hasattr(self, '_ids_to_nice_name'):
 
+            from string import ascii_uppercase
+
             # map type to rows to col and ID
             rooms_by_type_per_floor = defaultdict(lambda : defaultdict(list))
             for room in self:
@@ -96,15 +98,14 @@ class Rooms(list):
 
             static_data_rooms = load_static_data('rooms')
 
-            # map ID to nice name
-            self._ids_to_nice_name = defaultdict(str)
+            # map ID to nice name; the mapping is only published once complete,
+            # as other threads may be reading it
+            ids_to_nice_name = {}
             for room_type, rows in rooms_by_type_per_floor.items():
                 for i, row in enumerate(rows):
                     for j, room in enumerate(rows[row]):
-                        self._ids_to_nice_name[room['deserializeID']] =       \
+                        ids_to_nice_name[room['deserializeID']] =             \
                             "%s %s%s" % (static_data_rooms[room_type]['name'], i+1, ascii_uppercase[j])
+            self._ids_to_nice_name = ids_to_nice_name
 
-        try:
-            return self._ids_to_nice_name[value]
-        except KeyError:
-            raise
+        return self._ids_to_nice_name.get(value, '')
@@ -6,9 +6,8 @@ merely represents a reference to the 'vault' top-level key of the root and, as
 such, it subclasses the dict class.
 '''
 
-from pprint import pprint as pp
+from pyshelter.classes.rooms import Rooms
 
-from pyshelter import Rooms
 
 class Vault(dict):
     '''
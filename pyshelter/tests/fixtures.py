@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+'''
+Fixtures shared by the tests.
+'''
+
+from json import dumps
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from pyshelter.utils.benchmarks import synthetic_save
+
+
+class SavedGameTestCase(TestCase):
+    '''
+    The SavedGameTestCase class provides each test with a temporary directory
+    holding a synthetic saved game, at self.path. Subclasses set the number of
+    Dwellers it holds, or override saved_game to alter it.
+    '''
+    dwellers = 20
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = self.write_save(self.saved_game())
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def saved_game(self):
+        '''
+        Returns the saved game written at self.path.
+        '''
+        return synthetic_save(self.dwellers)
+
+
+    def temporary_path(self, filename):
+        '''
+        Returns the path of a file within the temporary directory.
+        '''
+        return join(self.directory.name, filename)
+
+
+    def write_save(self, save, filename='vault.json'):
+        '''
+        Writes a saved game to the temporary directory and returns its path.
+        '''
+        path = self.temporary_path(filename)
+        with open(path, 'w') as f_save:
+            f_save.write(dumps(save))
+
+        return path
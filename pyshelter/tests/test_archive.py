@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the SnapshotArchive.
+'''
+
+from io import StringIO
+from json import dumps
+from unittest import main
+
+from pyshelter.classes.pyshelter import PyShelter
+from pyshelter.tests.fixtures import SavedGameTestCase
+from pyshelter.utils.archive import SnapshotArchive
+from pyshelter.utils.benchmarks import archive_history
+
+
+class TestSnapshotArchive(SavedGameTestCase):
+    '''
+    Every version archived is restored exactly, once the archive reopened.
+    '''
+    def setUp(self):
+        super(TestSnapshotArchive, self).setUp()
+        self.history = archive_history(versions=12, dwellers=self.dwellers)
+
+
+    def test_append_after_reopening(self):
+        '''
+        Versions appended to a reopened archive follow the existing ones.
+        '''
+        path = self.temporary_path('vault.psa')
+        archive = SnapshotArchive(path, keyframe_interval=4)
+        for root in self.history[:6]:
+            archive.append(root)
+
+        archive = SnapshotArchive(path)
+        for root in self.history[6:]:
+            archive.append(root)
+
+        archive = SnapshotArchive(path)
+        for version, root in enumerate(self.history):
+            self.assertEqual(archive.get(version), root)
+
+
+    def test_equal_values(self):
+        '''
+        Values equal but serialized differently, e.g. 1 and 1.0 within a list
+        item or 0.0 and -0.0, are restored byte-exact.
+        '''
+        history = [{'d' : [{'x' : 1}, {'x' : 2}], 'z' : 0.0},                 \
+            {'d' : [{'x' : 1.0}, {'x' : 2}, {'x' : 3}], 'z' : -0.0},           \
+            {'d' : [{'x' : True}, {'x' : 2}], 'z' : 0.0}]
+        path = self.temporary_path('vault.psa')
+        archive = SnapshotArchive(path)
+        for root in history:
+            archive.append(root)
+
+        archive = SnapshotArchive(path)
+        for version, root in enumerate(history):
+            self.assertEqual(dumps(archive.get(version)), dumps(root))
+
+
+    def test_export(self):
+        '''
+        Versions are exported byte-exact with PyShelter.to_json.
+        '''
+        path = self.temporary_path('vault.psa')
+        archive = SnapshotArchive(path, keyframe_interval=4)
+        for root in self.history:
+            archive.append(root)
+
+        save = self.write_save(self.history[7], 'version.json')
+        output = self.temporary_path('output.json')
+        PyShelter(save).to_json(output)
+
+        exported = StringIO()
+        SnapshotArchive(path).export(7, exported)
+        with open(output) as f_output:
+            self.assertEqual(exported.getvalue(), f_output.read())
+
+
+    def test_get(self):
+        '''
+        Every version is restored, with both compression methods.
+        '''
+        for compression in ('zlib', 'lzma'):
+            with self.subTest(compression=compression):
+                path = self.temporary_path("%s.psa" % (compression))
+                archive = SnapshotArchive(path, keyframe_interval=5,          \
+                    compression=compression)
+                for root in self.history:
+                    archive.append(root)
+
+                archive = SnapshotArchive(path)
+                self.assertEqual(len(archive), len(self.history))
+                self.assertEqual(archive.compression, compression)
+                for version, root in enumerate(self.history):
+                    self.assertEqual(archive.get(version), root)
+                self.assertEqual(archive.get(-1), self.history[-1])
+                with self.assertRaises(IndexError):
+                    archive.get(len(self.history))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the concurrent access to a shared PyShelter instance.
+'''
+
+from json import dumps
+from random import Random
+from threading import Event, Thread
+from unittest import TestCase, main
+
+from pyshelter.classes.pyshelter import PyShelter
+from pyshelter.tests.fixtures import SavedGameTestCase
+from pyshelter.utils.benchmarks import concurrency_throughput
+from pyshelter.utils.concurrency import ReadWriteLock, SharedShelter
+
+
+class TestReadWriteLock(TestCase):
+    '''
+    Readers share the lock, the writer holds it alone and has precedence.
+    '''
+    def test_writer_preference(self):
+        '''
+        Once a writer waits, new readers wait for it to be done.
+        '''
+        lock = ReadWriteLock()
+        order = []
+        writer_waiting = Event()
+
+        def write():
+            writer_waiting.set()
+            with lock.write():
+                order.append('writer')
+
+        def read():
+            with lock.read():
+                order.append('reader')
+
+        with lock.read():
+            writer = Thread(target=write)
+            writer.start()
+            writer_waiting.wait()
+            while not lock._writers_waiting:
+                pass
+            reader = Thread(target=read)
+            reader.start()
+            reader.join(0.1)
+            self.assertTrue(reader.is_alive())
+            self.assertEqual(order, [])
+
+        writer.join()
+        reader.join()
+        self.assertEqual(order, ['writer', 'reader'])
+
+
+    def test_shared_readers(self):
+        '''
+        Many readers hold the lock at once.
+        '''
+        lock = ReadWriteLock()
+        inside = Event()
+
+        def read():
+            with lock.read():
+                inside.set()
+
+        with lock.read():
+            reader = Thread(target=read)
+            reader.start()
+            self.assertTrue(inside.wait(1))
+        reader.join()
+
+
+class TestSharedShelter(SavedGameTestCase):
+    '''
+    Readers never see a half-edited tree, and snapshots follow the edits.
+    '''
+    dwellers = 30
+
+    def test_no_torn_reads(self):
+        '''
+        Readers racing a writer see no torn Dweller, with either mode.
+        '''
+        measurements = concurrency_throughput(readers=4, duration=0.5,       \
+            dwellers=30, modes=('lock', 'snapshot'))
+        for mode, (reads, writes, violations) in measurements.items():
+            with self.subTest(mode=mode):
+                self.assertGreater(reads, 0)
+                self.assertGreater(writes, 0)
+                self.assertEqual(violations, 0)
+
+
+    def test_rollback(self):
+        '''
+        An exception within writing() rolls the edits back and publishes no
+        epoch.
+        '''
+        shelter = PyShelter(self.path)
+        shared = SharedShelter(shelter)
+        snapshot = shared.snapshot()
+        health = shelter.dwellers[0]['health']
+
+        with self.assertRaises(RuntimeError):
+            with shared.writing() as writing:
+                writing.reset_dweller(0)
+                raise RuntimeError()
+
+        self.assertIs(shelter.dwellers[0]['health'], health)
+        self.assertEqual(shared.epoch, 0)
+        self.assertIs(shared.snapshot(), snapshot)
+
+        with shared.writing() as writing:
+            writing.reset_dweller(1)
+        self.assertEqual(shared.epoch, 1)
+        self.assertEqual(shared.snapshot().root, shelter.to_dict())
+
+
+    def test_snapshot_compact_inventory(self):
+        '''
+        A compact Inventory within a value restored by undo is published as
+        the list of items.
+        '''
+        shelter = PyShelter(self.path)
+        shelter.compact_inventory()
+        shared = SharedShelter(shelter)
+
+        with shared.writing() as writing:
+            writing.journal.assign(writing.root['vault'], 'inventory',        \
+                {'items' : []})
+        shared.undo()
+
+        self.assertEqual(dumps(shared.snapshot().root),                       \
+            dumps(shelter.to_dict()))
+
+
+    def test_snapshots(self):
+        '''
+        Each snapshot matches the live tree once published, and is left
+        untouched by the later edits, including undo and reordering.
+        '''
+        shelter = PyShelter(self.path)
+        shelter.compact_inventory()
+        shared = SharedShelter(shelter)
+        random = Random(0)
+
+        published = []
+        for _ in range(60):
+            operation = random.random()
+            with shared.writing() as writing:
+                if operation < 0.5:
+                    writing.reset_dweller(random.randrange(30))
+                elif operation < 0.6:
+                    writing.dwellers = writing.dwellers[::-1]
+                elif operation < 0.7:
+                    writing.drop_vault_inventory_junk(random.randint(0, 50))
+                else:
+                    writing.dwellers_view().coffee_break(                     \
+                        random.randrange(30))
+            if random.random() < 0.2:
+                shared.undo()
+
+            published.append((shared.snapshot(), dumps(shelter.to_dict())))
+            self.assertEqual(dumps(shared.snapshot().root), published[-1][1])
+
+        for snapshot, expected in published:
+            self.assertEqual(dumps(snapshot.root), expected)
+
+
+if __name__ == '__main__':
+    main()
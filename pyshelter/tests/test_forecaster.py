@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the ExpeditionForecaster. They need NumPy, installed by the
+'forecast' extra, and are skipped without it.
+'''
+
+from importlib.util import find_spec
+from unittest import main, skipIf
+
+from pyshelter.classes.forecaster import ExpeditionForecaster, simulate_team, \
+    simulate_teams
+from pyshelter.classes.pyshelter import PyShelter
+from pyshelter.tests.fixtures import SavedGameTestCase
+
+
+@skipIf(find_spec('numpy') is None, 'NumPy is not installed.')
+class TestExpeditionForecaster(SavedGameTestCase):
+    '''
+    Forecasts are reproducible and consistent, however they are computed.
+    '''
+    dwellers = 30
+
+    def setUp(self):
+        super(TestExpeditionForecaster, self).setUp()
+        self.forecaster = ExpeditionForecaster(PyShelter(self.path))
+        self.teams = [self.forecaster.team_parameters(team)                   \
+            for team in self.forecaster.shelter.expeditions]
+
+
+    def test_full_team(self):
+        '''
+        A Team that cannot carry anything more is forced back on the first
+        hour.
+        '''
+        parameters = dict(self.teams[0], capacity=0, elapsed_hours=0.0)
+        forecast = simulate_team(parameters, trials=200, seed=0)
+
+        self.assertEqual(forecast['forced_return_probability'], 1.0)
+        self.assertEqual(forecast['death_probability'], 0.0)
+        self.assertEqual(forecast['return_hours']['p90'],                     \
+            1.0 + parameters['return_ratio'])
+        self.assertEqual(sum(forecast['loot'].values()), 0.0)
+
+
+    def test_probabilities(self):
+        '''
+        Probabilities lie within [0, 1], for fragile and sturdy Teams alike.
+        '''
+        teams = self.teams + [dict(team, health=[1.0] * len(team['health']))  \
+            for team in self.teams]
+        for forecast in simulate_teams(teams, trials=200, seed=0):
+            for name in ('death_probability', 'forced_return_probability'):
+                with self.subTest(name=name):
+                    self.assertGreaterEqual(forecast[name], 0.0)
+                    self.assertLessEqual(forecast[name], 1.0)
+
+
+    def test_processes(self):
+        '''
+        Spreading the Teams over processes does not change the forecasts.
+        '''
+        self.assertEqual(simulate_teams(self.teams, trials=200, processes=2,  \
+            seed=0, threshold=0), simulate_teams(self.teams, trials=200,      \
+            processes=1, seed=0))
+
+
+    def test_seed(self):
+        '''
+        The same seed gives the same forecasts, another one does not.
+        '''
+        forecast = self.forecaster.forecast(trials=200, seed=0)
+        self.assertEqual(self.forecaster.forecast(trials=200, seed=0),        \
+            forecast)
+        self.assertNotEqual(self.forecaster.forecast(trials=200, seed=1),     \
+            forecast)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the imports of the modules used by short-lived invocations. Their
+import time depends on the machine, hence it is only measured by the
+importtime benchmark: the tests check what the modules import.
+'''
+
+from subprocess import run
+from sys import executable
+from unittest import main
+
+from pyshelter.tests.fixtures import SavedGameTestCase
+from pyshelter.utils.benchmarks import IMPORT_TIME_BUDGET,                    \
+    IMPORT_TIME_FORBIDDEN, import_time
+
+
+# The pyshelter modules each module eagerly imports.
+EAGER_MODULES = {
+    'pyshelter' : {'pyshelter'},
+    'pyshelter.classes.pyshelter' : {'pyshelter', 'pyshelter.classes',
+        'pyshelter.classes.inventory', 'pyshelter.classes.pyshelter',
+        'pyshelter.classes.resources', 'pyshelter.classes.rooms',
+        'pyshelter.classes.vault', 'pyshelter.utils',
+        'pyshelter.utils.instrumentation', 'pyshelter.utils.io',
+        'pyshelter.utils.journal', 'pyshelter.utils.json_codecs'},
+}
+
+
+class TestImportTime(SavedGameTestCase):
+    '''
+    Each module is imported in a fresh interpreter.
+    '''
+    def test_eager_modules(self):
+        '''
+        Each module eagerly imports the expected pyshelter modules only.
+        '''
+        for module_name in sorted(IMPORT_TIME_BUDGET):
+            with self.subTest(module_name=module_name):
+                _, modules = import_time(module_name, repeat=1)
+                self.assertEqual({module for module in modules                \
+                    if module.split('.')[0] == 'pyshelter'},                  \
+                    EAGER_MODULES[module_name])
+
+
+    def test_forbidden(self):
+        '''
+        No module eagerly imports a forbidden one.
+        '''
+        for module_name in sorted(IMPORT_TIME_BUDGET):
+            _, modules = import_time(module_name, repeat=1)
+            for forbidden in IMPORT_TIME_FORBIDDEN:
+                with self.subTest(module_name=module_name,
+                    forbidden=forbidden):
+                    self.assertNotIn(forbidden, modules)
+
+
+    def test_lazy_classes(self):
+        '''
+        The public classes are resolved on first access.
+        '''
+        import pyshelter
+
+        for name in pyshelter.__all__:
+            with self.subTest(name=name):
+                self.assertEqual(getattr(pyshelter, name).__name__, name)
+
+
+    def test_no_catalog_loaded(self):
+        '''
+        Loading a game loads no catalog, nor the YAML parser.
+        '''
+        completed = run([executable, '-c', "import sys\n"                     \
+            "from pyshelter.classes.pyshelter import PyShelter\n"             \
+            "from pyshelter.utils.io import _static_data\n"                   \
+            "PyShelter(sys.argv[1])\n"                                        \
+            "print(sorted(_static_data), 'yaml' in sys.modules)", self.path], \
+            capture_output=True, text=True, check=True)
+        self.assertEqual(completed.stdout.strip(), '[] False')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the instrumentation hooks and of their sinks.
+'''
+
+from json import loads
+from unittest import main
+
+from pyshelter.classes.pyshelter import PyShelter
+from pyshelter.tests.fixtures import SavedGameTestCase
+from pyshelter.utils.instrumentation import JSONLinesSink, MemorySink,        \
+    PrometheusSink, disable, enable
+
+
+class TestInstrumentation(SavedGameTestCase):
+    '''
+    The wrappers are only installed while enabled, and report every call.
+    '''
+    def setUp(self):
+        super(TestInstrumentation, self).setUp()
+        self.addCleanup(disable)
+
+
+    def test_enable_disable(self):
+        '''
+        enable() installs the wrappers and disable() restores the very
+        original attributes.
+        '''
+        originals = dict(vars(PyShelter))
+
+        enable(MemorySink())
+        self.assertIsNot(vars(PyShelter)['reset_dweller'],                    \
+            originals['reset_dweller'])
+        self.assertIsNot(vars(PyShelter)['dwellers'], originals['dwellers'])
+
+        disable()
+        for attribute_name, attribute in originals.items():
+            with self.subTest(attribute_name=attribute_name):
+                self.assertIs(vars(PyShelter)[attribute_name], attribute)
+
+
+    def test_json_lines_sink(self):
+        '''
+        Each record is written as a line of JSON.
+        '''
+        output = self.temporary_path('records.jsonl')
+        sink = JSONLinesSink(output)
+        shelter = PyShelter(self.path)
+
+        enable(sink)
+        shelter.reset_dweller(0)
+        disable()
+        sink.close()
+
+        with open(output) as f_output:
+            records = [loads(line) for line in f_output]
+        self.assertIn('PyShelter.reset_dweller',                              \
+            [record['operation'] for record in records])
+        for record in records:
+            self.assertEqual(sorted(record), ['duration', 'operation'])
+
+
+    def test_memory_sink(self):
+        '''
+        Records are aggregated per operation.
+        '''
+        sink = MemorySink()
+        for duration, memory_peak in ((0.5, 10), (1.5, 30), (1.0, 20)):
+            sink.emit({'operation' : 'a', 'duration' : duration, 'memory' : 1,\
+                'memory_peak' : memory_peak})
+        sink.emit({'operation' : 'b', 'duration' : 0.25})
+
+        self.assertEqual(sink.report(), [('a', 3, 3.0, 1.5),                  \
+            ('b', 1, 0.25, 0.25)])
+        self.assertEqual(sink.memory_report(), [('a', 3, 30)])
+        sink.reset()
+        self.assertEqual(sink.report(), [])
+
+
+    def test_memory_tracing(self):
+        '''
+        The outermost operations report their memory, the nested ones do not.
+        '''
+        records = []
+
+        class ListSink(object):
+            def emit(self, record):
+                records.append(record)
+
+        shelter = PyShelter(self.path)
+        enable(ListSink(), trace_memory=True)
+        shelter.reset_dweller(0)
+        shelter.reset_dweller(1)
+        disable()
+
+        outermost = [record for record in records                             \
+            if record['operation'] == 'PyShelter.reset_dweller']
+        self.assertEqual(len(outermost), 2)
+        for record in outermost:
+            self.assertGreaterEqual(record['memory_peak'], 0)
+        for record in records:
+            if record not in outermost:
+                self.assertNotIn('memory', record)
+
+
+    def test_prometheus_sink(self):
+        '''
+        The statistics are written in the text exposition format.
+        '''
+        output = self.temporary_path('pyshelter.prom')
+        sink = PrometheusSink(output, prefix='test')
+        sink.emit({'operation' : 'b', 'duration' : 0.5})
+        sink.emit({'operation' : 'a', 'duration' : 0.25, 'memory_peak' : 64})
+        sink.emit({'operation' : 'a', 'duration' : 1.0, 'memory_peak' : 32})
+        sink.write()
+
+        with open(output) as f_output:
+            self.assertEqual(f_output.read(), '\n'.join((
+                '# HELP test_calls_total Number of calls.',
+                '# TYPE test_calls_total counter',
+                'test_calls_total{operation="a"} 2',
+                'test_calls_total{operation="b"} 1',
+                '# HELP test_duration_seconds_total Total time spent, in '
+                    'seconds.',
+                '# TYPE test_duration_seconds_total counter',
+                'test_duration_seconds_total{operation="a"} 1.25',
+                'test_duration_seconds_total{operation="b"} 0.5',
+                '# HELP test_duration_seconds_max Slowest call, in seconds.',
+                '# TYPE test_duration_seconds_max gauge',
+                'test_duration_seconds_max{operation="a"} 1.0',
+                'test_duration_seconds_max{operation="b"} 0.5',
+                '# HELP test_memory_peak_bytes Largest memory peak of a call, '
+                    'in bytes.',
+                '# TYPE test_memory_peak_bytes gauge',
+                'test_memory_peak_bytes{operation="a"} 64',
+                'test_memory_peak_bytes{operation="b"} 0',
+                )) + '\n')
+
+
+    def test_properties(self):
+        '''
+        Property getters and setters are reported as distinct operations.
+        '''
+        sink = MemorySink()
+        shelter = PyShelter(self.path)
+
+        enable(sink)
+        shelter.dwellers = shelter.dwellers[::-1]
+        disable()
+
+        self.assertEqual(sink.stats['PyShelter.dwellers']['calls'], 1)
+        self.assertEqual(sink.stats['PyShelter.dwellers=']['calls'], 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the compact Inventory, against the list of items it replaces.
+'''
+
+from random import Random
+from unittest import main
+
+from pyshelter.classes.inventory import Inventory
+from pyshelter.classes.pyshelter import PyShelter
+from pyshelter.tests.fixtures import SavedGameTestCase
+from pyshelter.utils.benchmarks import synthetic_save
+from pyshelter.utils.io import load_static_data
+
+
+def mixed_items(seed=0):
+    '''
+    Returns a sorted list of items mixing Junk of every rarity, Weapons,
+    Outfits and pets, which hold unhashable attributes.
+    '''
+    random = Random(seed)
+    junk = sorted(load_static_data('junk'))
+    items = [{'hasBeenAssigned' : False, 'hasRandonWeaponBeenAssigned' :      \
+        False, 'id' : random.choice(junk), 'type' : 'Junk'}                   \
+        for _ in range(2000)]
+    items += [{'hasBeenAssigned' : random.random() < 0.5,                     \
+        'hasRandonWeaponBeenAssigned' : False, 'id' : 'Fist',                 \
+        'type' : 'Weapon'} for _ in range(20)]
+    items += [{'hasBeenAssigned' : False, 'hasRandonWeaponBeenAssigned' :     \
+        False, 'id' : 'AllNightware', 'type' : 'Outfit'} for _ in range(5)]
+    items += [{'extraData' : {'uniqueName' : "Pet%s" % (i), 'bonus' : 1},     \
+        'id' : 'husky_c', 'type' : 'Pet'} for i in range(3)]
+
+    return sorted(items, key=lambda item: item['id'])
+
+
+class TestInventory(SavedGameTestCase):
+    '''
+    The Inventory behaves as the list of items it is built from.
+    '''
+    def saved_game(self):
+        save = synthetic_save(self.dwellers)
+        save['vault']['inventory']['items'] = mixed_items()
+        return save
+
+
+    def test_counts(self):
+        '''
+        Items are counted by (type, id) and by rarity.
+        '''
+        items = mixed_items()
+        inventory = Inventory(items)
+
+        self.assertEqual(len(inventory), len(items))
+        self.assertEqual(inventory.count_by_item()[('Weapon', 'Fist')], 20)
+        self.assertEqual(inventory.count_by_item()[('Pet', 'husky_c')], 3)
+        self.assertEqual(sum(inventory.count_by_rarity().values()),          \
+            len(items))
+
+
+    def test_drop_junk(self):
+        '''
+        Dropping junk from a compact inventory keeps the same items as
+        dropping it from the list.
+        '''
+        for thresholds in ((30, 40, 50), (0, 0, 0), (5, 100, 1)):
+            with self.subTest(thresholds=thresholds):
+                expected = PyShelter(self.path)
+                expected.drop_vault_inventory_junk(*thresholds)
+
+                shelter = PyShelter(self.path)
+                shelter.compact_inventory()
+                shelter.drop_vault_inventory_junk(*thresholds)
+
+                self.assertEqual(shelter.inventory.to_list(),                 \
+                    expected.inventory)
+
+
+    def test_drop_unknown_junk(self):
+        '''
+        Junk missing from the catalog raises a KeyError, as with the list.
+        '''
+        items = mixed_items() + [{'id' : 'Unknown', 'type' : 'Junk'}]
+        with self.assertRaises(KeyError):
+            Inventory(items).drop_junk()
+
+
+    def test_read_only(self):
+        '''
+        Items are returned as read-only views, by index or iteration, and a
+        list of them assigned back keeps the inventory compact.
+        '''
+        items = mixed_items()
+        inventory = Inventory(items)
+
+        self.assertEqual(inventory[0], items[0])
+        self.assertEqual(inventory[-1], items[-1])
+        self.assertEqual([dict(item) for item in inventory], items)
+        with self.assertRaises(TypeError):
+            inventory[0]['hasBeenAssigned'] = True
+        with self.assertRaises(TypeError):
+            next(iter(inventory))['hasBeenAssigned'] = True
+        with self.assertRaises(IndexError):
+            inventory[len(items)]
+
+        shelter = PyShelter(self.path)
+        shelter.compact_inventory()
+        shelter.inventory = [item for item in shelter.inventory               \
+            if item['type'] != 'Weapon']
+        self.assertIsInstance(shelter.inventory, Inventory)
+        self.assertEqual(shelter.inventory.to_list(), [item for item in items \
+            if item['type'] != 'Weapon'])
+
+
+    def test_round_trip(self):
+        '''
+        The items are rebuilt as they were, in order.
+        '''
+        items = mixed_items()
+        self.assertEqual(Inventory(items).to_list(), items)
+
+
+    def test_to_json(self):
+        '''
+        A vault with a compact inventory is written back byte-exact.
+        '''
+        output = self.temporary_path('output.json')
+        shelter = PyShelter(self.path)
+        shelter.compact_inventory()
+        shelter.to_json(output)
+
+        with open(self.path, 'rb') as f_save, open(output, 'rb') as f_output:
+            self.assertEqual(f_output.read(), f_save.read())
+
+
+if __name__ == '__main__':
+    main()
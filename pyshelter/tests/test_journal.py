@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the Journal and of the edits of PyShelter going through it.
+'''
+
+from unittest import TestCase, main
+
+from pyshelter.classes.pyshelter import PyShelter
+from pyshelter.tests.fixtures import SavedGameTestCase
+from pyshelter.utils.journal import Journal
+
+
+class TestJournal(TestCase):
+    '''
+    Edits are committed, rolled back, undone and redone as transactions.
+    '''
+    def test_depth(self):
+        '''
+        Only the last 'depth' transactions can be undone.
+        '''
+        journal = Journal(depth=2)
+        node = {}
+        for i in range(3):
+            journal.assign(node, 'key', i)
+
+        journal.undo()
+        journal.undo()
+        self.assertEqual(node, {'key' : 0})
+        self.assertFalse(journal.can_undo)
+
+
+    def test_hooks(self):
+        '''
+        Hooks are called once per transaction committed, undone, redone or
+        rolled back.
+        '''
+        journal = Journal()
+        calls = []
+        journal.subscribe(calls.append)
+
+        with journal.transaction():
+            journal.assign({}, 'key', 1)
+            journal.assign({}, 'key', 2)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(calls[0]), 2)
+        journal.undo()
+        journal.redo()
+        with self.assertRaises(KeyError):
+            with journal.transaction():
+                journal.assign({}, 'key', 1)
+                raise KeyError('key')
+        self.assertEqual(len(calls), 4)
+
+
+    def test_rollback(self):
+        '''
+        An exception rolls back all the edits of the transaction, including
+        the ones of nested transactions, and removes the keys it added.
+        '''
+        journal = Journal()
+        node = {'a' : 1}
+
+        with self.assertRaises(ValueError):
+            with journal.transaction():
+                journal.assign(node, 'a', 2)
+                with journal.transaction():
+                    journal.assign(node, 'b', 3)
+                raise ValueError()
+
+        self.assertEqual(node, {'a' : 1})
+        self.assertFalse(journal.can_undo)
+
+
+    def test_undo_redo(self):
+        '''
+        A transaction is undone and redone as a whole; a new edit clears the
+        transactions to redo.
+        '''
+        journal = Journal()
+        node = {'a' : 1}
+
+        with journal.transaction():
+            journal.assign(node, 'a', 2)
+            journal.assign(node, 'b', 3)
+        journal.undo()
+        self.assertEqual(node, {'a' : 1})
+        journal.redo()
+        self.assertEqual(node, {'a' : 2, 'b' : 3})
+
+        journal.undo()
+        journal.assign(node, 'a', 4)
+        self.assertFalse(journal.can_redo)
+        with self.assertRaises(IndexError):
+            journal.redo()
+
+
+class TestPyShelterJournal(SavedGameTestCase):
+    '''
+    The edits of PyShelter can be undone, and the indexes derived from the
+    JSON follow.
+    '''
+    def test_reset_dweller(self):
+        '''
+        Resetting a Dweller is undone as a whole.
+        '''
+        shelter = PyShelter(self.path)
+        experience = shelter.dwellers[0]['experience']
+        health = shelter.dwellers[0]['health']
+
+        shelter.reset_dweller(0)
+        self.assertEqual(shelter.dwellers[0]['health']['maxHealth'], 105.0)
+        shelter.undo()
+        self.assertIs(shelter.dwellers[0]['experience'], experience)
+        self.assertIs(shelter.dwellers[0]['health'], health)
+
+
+    def test_stale_index(self):
+        '''
+        The index of the Dweller IDs is dropped on undo, redo and rollback.
+        '''
+        shelter = PyShelter(self.path)
+        reversed_index = len(shelter.dwellers) - 1 - 3
+
+        shelter.dwellers = shelter.dwellers[::-1]
+        self.assertEqual(shelter.dweller_id_to_idx(3), reversed_index)
+        shelter.undo()
+        self.assertEqual(shelter.dweller_id_to_idx(3), 3)
+        shelter.redo()
+        self.assertEqual(shelter.dweller_id_to_idx(3), reversed_index)
+        shelter.undo()
+
+        with self.assertRaises(RuntimeError):
+            with shelter.transaction():
+                shelter.dwellers = shelter.dwellers[::-1]
+                shelter.dweller_id_to_idx(3)
+                raise RuntimeError()
+        self.assertEqual(shelter.dweller_id_to_idx(3), 3)
+
+
+    def test_views(self):
+        '''
+        The edits made through the Dwellers and Expeditions views join the
+        transactions of the PyShelter instance.
+        '''
+        shelter = PyShelter(self.path)
+        room = shelter.dwellers[0]['savedRoom']
+        items = shelter.expeditions[0]['teamEquipment']['inventory']['items']
+
+        with self.assertRaises(RuntimeError):
+            with shelter.transaction():
+                shelter.dwellers_view().coffee_break(0)
+                shelter.expeditions_view().drop_junk()
+                raise RuntimeError()
+        self.assertEqual(shelter.dwellers[0]['savedRoom'], room)
+        self.assertIs(shelter.expeditions[0]['teamEquipment']['inventory']    \
+            ['items'], items)
+
+        shelter.dwellers_view().coffee_break(0)
+        self.assertEqual(shelter.dwellers[0]['savedRoom'], -1)
+        shelter.undo()
+        self.assertEqual(shelter.dwellers[0]['savedRoom'], room)
+
+
+if __name__ == '__main__':
+    main()
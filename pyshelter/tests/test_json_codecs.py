@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the JSON codecs, against the standard library's json module.
+'''
+
+from unittest import TestCase, main
+
+from pyshelter.utils.json_codecs import Codec, available_codecs, get_codec,   \
+    round_trips
+
+
+# Documents a faster backend may parse differently from the baseline.
+DOCUMENTS = {
+    'NaN' : b'{"a": NaN, "b": [Infinity, -Infinity]}',
+    'big int' : b'{"a": 123456789012345678901234567890}',
+    'big negative int' : b'[-9223372036854775809, 18446744073709551616]',
+    'big top-level int' : b'123456789012345678901234567890',
+    'negative zero' : b'{"a": -0.0, "b": -0}',
+    'non-ASCII' : '{"a": "h\\u00e9 é 中 \U0001f600"}'.encode('utf-8'),
+    'BOM' : b'\xef\xbb\xbf{"a": 1}',
+    }
+
+
+class TestCodecs(TestCase):
+    '''
+    Every codec saves back what it loads exactly as the baseline does.
+    '''
+    def test_long_integers(self):
+        '''
+        Integers too large for 64 bits are kept as integers.
+        '''
+        data = get_codec().loads(DOCUMENTS['big int'])
+        self.assertEqual(data['a'], 123456789012345678901234567890)
+        self.assertIsInstance(data['a'], int)
+
+
+    def test_round_trips(self):
+        '''
+        Every document round trips through get_codec() and through every
+        parser available, combined with the baseline serializer.
+        '''
+        codecs = [get_codec()] + [Codec(parser)                               \
+            for parser in available_codecs()]
+        for codec in codecs:
+            for name, raw_data in DOCUMENTS.items():
+                with self.subTest(codec=codec.name, document=name):
+                    self.assertTrue(round_trips(codec, raw_data))
+
+
+if __name__ == '__main__':
+    main()
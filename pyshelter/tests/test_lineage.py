@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the Lineage of the Dwellers.
+'''
+
+from unittest import TestCase, main
+
+from pyshelter.classes.dwellers import Dwellers
+from pyshelter.classes.lineage import FEMALE, Lineage, MALE
+
+
+def dweller(dweller_id, gender, parents=(), grandparents=()):
+    '''
+    Returns a Dweller with the given ascendants, -1 marking unknown ones.
+    '''
+    ascendants = list(parents) + [-1] * (2 - len(parents)) +                  \
+        list(grandparents) + [-1] * (4 - len(grandparents))
+    return {'gender' : gender, 'relations' : {'ascendants' : ascendants},     \
+        'serializeId' : dweller_id}
+
+
+def family():
+    '''
+    Returns three generations of Dwellers:
+
+        0 (F) + 1 (M) -> 2 (F), 3 (M)
+        2 (F) + 5 (M) -> 4 (M)
+        3 (M) + 7 (F) -> 6 (F)
+        0 (F) + 5 (M) -> 8 (M)
+        99, no longer in the Vault -> 9 (F), 10 (M)
+    '''
+    return [
+        dweller(0, FEMALE), dweller(1, MALE),
+        dweller(2, FEMALE, (0, 1)), dweller(3, MALE, (0, 1)),
+        dweller(5, MALE), dweller(7, FEMALE),
+        dweller(4, MALE, (2, 5), (0, 1)), dweller(6, FEMALE, (3, 7), (0, 1)),
+        dweller(8, MALE, (0, 5)),
+        dweller(9, FEMALE, (99,)), dweller(10, MALE, (99,)),
+    ]
+
+
+class TestLineage(TestCase):
+    '''
+    Related Dwellers cannot be paired.
+    '''
+    def test_related(self):
+        '''
+        Every relation the game records is detected, and only those.
+        '''
+        lineage = Lineage(family())
+        cases = {
+            (0, 1) : False,     # partners
+            (0, 2) : True,      # parent
+            (2, 3) : True,      # siblings
+            (4, 0) : True,      # grandparent
+            (4, 3) : True,      # uncle
+            (4, 6) : True,      # cousins
+            (8, 2) : True,      # half-siblings
+            (9, 10) : True,     # ascendant no longer in the Vault
+            (2, 5) : False,
+            (3, 7) : False,
+            (6, 8) : True,      # through the grandmother
+            (6, 10) : False,
+        }
+        for (dweller_id, other_id), related in cases.items():
+            with self.subTest(dweller_id=dweller_id, other_id=other_id):
+                self.assertEqual(lineage.related(dweller_id, other_id),       \
+                    related)
+                self.assertEqual(lineage.related(other_id, dweller_id),       \
+                    related)
+
+
+    def test_eligible_pairs(self):
+        '''
+        Only unrelated pairs of opposite genders are eligible.
+        '''
+        lineage = Lineage(family())
+        self.assertEqual(sorted(lineage.eligible_pairs([0, 1, 2, 3, 5])),     \
+            [(0, 1), (0, 5), (2, 5)])
+        self.assertEqual(sorted(lineage.partners(6)), [5, 10])
+
+
+    def test_reconcile(self):
+        '''
+        The Lineage of the Dwellers follows the Dwellers removed and added
+        once reconciled, even when their number does not change.
+        '''
+        dwellers = Dwellers(family())
+        lineage = dwellers.lineage
+        self.assertIn(5, lineage.partners(2))
+
+        dwellers.remove(next(d for d in dwellers if d['serializeId'] == 5))
+        self.assertIs(dwellers.lineage, lineage)
+        self.assertIn(5, dwellers.lineage)
+        self.assertEqual(dwellers.lineage.update(dwellers), 1)
+        self.assertNotIn(5, dwellers.lineage)
+        self.assertNotIn(5, dwellers.lineage.partners(2))
+        self.assertEqual(len(dwellers.lineage), len(dwellers))
+
+        dwellers.pop()
+        dwellers.append(dweller(11, MALE, (9,)))
+        self.assertEqual(dwellers.lineage.update(dwellers), 2)
+        self.assertNotIn(10, dwellers.lineage)
+        self.assertIn(11, dwellers.lineage.partners(2))
+        self.assertTrue(dwellers.lineage.related(11, 9))
+
+
+if __name__ == '__main__':
+    main()
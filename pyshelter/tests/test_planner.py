@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the RoomPlanner.
+'''
+
+from itertools import product
+from random import Random
+from unittest import TestCase, main
+
+from pyshelter.classes.planner import RoomPlanner
+
+
+ROOM_TYPES = ('Cafeteria', 'Geothermal', 'MedBay', 'WaterPlant', 'Storage')
+
+
+def rooms(count, seed=0):
+    '''
+    Returns count rooms of random type, merge level and level. Storage rooms
+    do not produce.
+    '''
+    random = Random(seed)
+    return [{'deserializeID' : i, 'level' : random.randint(1, 3),             \
+        'mergeLevel' : random.randint(1, 3),                                  \
+        'type' : random.choice(ROOM_TYPES)} for i in range(count)]
+
+
+def brute_force(planner, budget):
+    '''
+    Returns the best overall gain within budget, trying every combination of
+    options, none included, of every room.
+    '''
+    choices = [[(0, 0)] + [(option[2], option[3]) for option in               \
+        planner.room_options(room)] for room in planner.rooms]
+
+    best = 0
+    for combination in product(*choices):
+        if sum(cost for cost, _ in combination) <= budget:
+            best = max(best, sum(gain for _, gain in combination))
+    return best
+
+
+class TestRoomPlanner(TestCase):
+    '''
+    Plans stay within budget, and the exact solver finds the best one.
+    '''
+    def test_budget_validation(self):
+        '''
+        Budgets that are not a finite, non-negative number of caps are
+        rejected with a ValueError, whatever the solver.
+        '''
+        planner = RoomPlanner(rooms(5))
+        for budget, solver in product((-1, -0.5, True, False, float('nan'),   \
+            float('inf')), ('dp', 'greedy')):
+            with self.subTest(budget=budget, solver=solver):
+                with self.assertRaises(ValueError):
+                    planner.plan(budget, solver=solver)
+        with self.assertRaises(TypeError):
+            planner.plan('1000')
+
+
+    def test_dp_is_optimal(self):
+        '''
+        The dynamic programming solver matches brute force.
+        '''
+        for seed, budget in product(range(4), (0, 600, 2500, 7000)):
+            with self.subTest(seed=seed, budget=budget):
+                planner = RoomPlanner(rooms(5, seed))
+                actions = planner.plan(budget)
+                self.assertLessEqual(sum(a['cost'] for a in actions), budget)
+                self.assertEqual(sum(a['gain'] for a in actions),             \
+                    brute_force(planner, budget))
+
+
+    def test_greedy_within_budget(self):
+        '''
+        The greedy solver stays within budget and never beats the exact one.
+        '''
+        for budget in (0, 1000, 10000, 100000):
+            with self.subTest(budget=budget):
+                planner = RoomPlanner(rooms(40))
+                greedy = planner.plan(budget, solver='greedy')
+                exact = planner.plan(budget)
+                self.assertLessEqual(sum(a['cost'] for a in greedy), budget)
+                self.assertLessEqual(sum(a['gain'] for a in greedy),          \
+                    sum(a['gain'] for a in exact))
+
+
+    def test_mergeable_changes(self):
+        '''
+        Options are recomputed when a room can no longer be merged.
+        '''
+        room = {'deserializeID' : 0, 'level' : 1, 'mergeLevel' : 1,           \
+            'type' : 'Cafeteria'}
+        blocked = set()
+        planner = RoomPlanner([room],                                        \
+            can_merge=lambda r: r['deserializeID'] not in blocked)
+
+        self.assertIn(2, [o[0] for o in planner.room_options(room)])
+        blocked.add(0)
+        self.assertEqual({o[0] for o in planner.room_options(room)}, {1})
+        self.assertTrue(all(a['action'] == 'upgrade'                          \
+            for a in planner.plan(100000)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+'''
+Tests of the watch mode.
+'''
+
+from os import chmod, stat
+from queue import Queue
+from threading import Event, Lock, Thread
+from time import sleep
+from unittest import main
+
+from pyshelter.classes.pyshelter import PyShelter
+from pyshelter.tests.fixtures import SavedGameTestCase
+from pyshelter.utils.benchmarks import synthetic_save
+from pyshelter.utils.watch import Watcher, _digest
+
+
+class TestWatcher(SavedGameTestCase):
+    '''
+    Saves are processed one worker at a time, and never overwritten once
+    changed by someone else.
+    '''
+    def test_one_worker_per_save(self):
+        '''
+        A save changed while being processed is processed again, after the
+        current run and never concurrently with it.
+        '''
+        lock = Lock()
+        processed = Event()
+        started = Event()
+        state = {'active' : 0, 'calls' : 0, 'max_active' : 0}
+
+        def on_result(path, results):
+            with lock:
+                state['active'] += 1
+                state['calls'] += 1
+                state['max_active'] = max(state['max_active'], state['active'])
+            started.set()
+            sleep(0.5)
+            with lock:
+                state['active'] -= 1
+                if state['calls'] == 2:
+                    processed.set()
+
+        watcher, thread = self._watch(on_result=on_result, workers=2,          \
+            process_existing=True)
+        self.assertTrue(started.wait(5))
+        with open(self.path, 'a') as f_save:
+            f_save.write('\n')
+        self.assertTrue(processed.wait(5))
+        watcher.stop()
+        thread.join()
+
+        self.assertEqual(state['max_active'], 1)
+        self.assertEqual(state['calls'], 2)
+
+
+    def test_run(self):
+        '''
+        Saves written to the directory are processed, once per content.
+        '''
+        results = Queue()
+        watcher, thread = self._watch(on_result=lambda path, result:           \
+            results.put((path, result)))
+
+        other = self.write_save(synthetic_save(5), 'other.vault.json')
+        path, result = results.get(timeout=5)
+        self.assertEqual(path, other)
+        self.assertEqual(list(result), ['retrain_report'])
+
+        with open(other, 'rb') as f_save:
+            content = f_save.read()
+        with open(other, 'wb') as f_save:
+            f_save.write(content)
+        sleep(0.3)
+        watcher.stop()
+        thread.join()
+        self.assertTrue(results.empty())
+
+
+    def test_write_back(self):
+        '''
+        Edited saves are written back in place, keeping their permissions.
+        '''
+        chmod(self.path, 0o644)
+        watcher = Watcher(self.directory.name, operations=('junk_drop',),     \
+            write_back=True, polling=True)
+        watcher.process(self.path)
+
+        expected = PyShelter(self.path)
+        self.assertLess(len(expected.inventory), 20 * 50)
+        self.assertEqual(stat(self.path).st_mode & 0o777, 0o644)
+        self.assertIsNone(watcher.process(self.path))
+
+
+    def test_write_back_changed(self):
+        '''
+        A save changed since it was loaded is not written back.
+        '''
+        watcher = Watcher(self.directory.name, operations=('junk_drop',),     \
+            write_back=True, polling=True)
+        digest = _digest(self.path)
+        shelter = PyShelter(self.path)
+        shelter.drop_vault_inventory_junk()
+
+        with open(self.path, 'a') as f_save:
+            f_save.write('\n')
+        with open(self.path, 'rb') as f_save:
+            newer = f_save.read()
+
+        watcher._write_back(shelter, self.path, digest)
+        with open(self.path, 'rb') as f_save:
+            self.assertEqual(f_save.read(), newer)
+
+
+    def _watch(self, process_existing=False, **kwargs):
+        '''
+        Returns a Watcher polling the temporary directory, and the thread
+        running it.
+        '''
+        watcher = Watcher(self.directory.name, polling=True, interval=0.02,   \
+            debounce=0.05, **kwargs)
+        thread = Thread(target=watcher.run, args=(process_existing,))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(watcher.stop)
+        return watcher, thread
+
+
+if __name__ == '__main__':
+    main()
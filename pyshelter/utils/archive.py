@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+
+'''
+This module provides the SnapshotArchive, a compressed and versioned history
+of the saves of a Vault.
+
+Every 'keyframe_interval' versions, the whole root is stored; the versions in
+between are stored as structural deltas against the previous one: the values
+set and the list slices replaced, by path. Each record is compressed on its
+own, either with zlib and a dictionary trained on the first save archived, or
+with lzma, which does not support dictionaries but compresses keyframes
+better. Since records are small, the dictionary, made of the keys and the
+recurring small objects of the save schema, is what makes zlib effective.
+
+The archive is a single append-only file:
+
+    magic, compression method, keyframe interval, dictionary
+    (kind, length, payload) for each version
+
+The offsets of the records are indexed when the archive is opened. Reading a
+version looks up its keyframe by bisection, then applies at most
+keyframe_interval - 1 deltas. Versions are exported back to plain JSON,
+byte-exact with PyShelter.to_json, as a stream.
+'''
+
+from bisect import bisect_right
+from collections import Counter
+from os.path import exists, getsize
+from struct import calcsize, pack, unpack
+
+from pyshelter.utils.json_codecs import get_codec
+
+
+_MAGIC = b'PSA1'
+_HEADER = '<BIH'
+_RECORD = '<BI'
+
+_KEYFRAME, _DELTA = 0, 1
+_METHODS = ('zlib', 'lzma')
+
+# Maximum size of a zlib dictionary.
+_ZDICT_SIZE = 32768
+
+
+class SnapshotArchive(object):
+    '''
+    The SnapshotArchive class represents the history of the saves of a Vault,
+    stored as keyframes and compressed deltas.
+    '''
+    def __init__(self, path=None, keyframe_interval=32, compression='zlib'):
+        '''
+        Opens the archive at path, creating it if it does not exist. The
+        keyframe interval and compression method only apply to new archives;
+        existing ones keep their own.
+        '''
+        if path is None:
+            raise ValueError('The path of the archive must be provided.')
+        if not isinstance(keyframe_interval, int) or keyframe_interval < 1:
+            raise ValueError("The keyframe interval must be a positive int, " \
+                "not %s." % (keyframe_interval))
+        if compression not in _METHODS:
+            raise ValueError("The compression must be either 'zlib' or "      \
+                "'lzma', not %s." % (compression))
+
+        self.codec = get_codec()
+        self.compression = compression
+        self.keyframe_interval = keyframe_interval
+        self.path = path
+
+        self._keyframes = []
+        self._last = None
+        self._offsets = []
+        self._zdict = None
+
+        if exists(path) and getsize(path):
+            self._load_index()
+
+
+    def __len__(self):
+        '''
+        Returns the number of versions archived.
+        '''
+        return len(self._offsets)
+
+
+    def append(self, root=None):
+        '''
+        Archives a new version, given as a root or a PyShelter instance, and
+        returns its number.
+        '''
+        if root is None:
+            raise ValueError('The root to archive must be provided.')
+        if hasattr(root, 'to_dict'):
+            root = root.to_dict()
+        if not isinstance(root, dict):
+            raise TypeError("The root must be provided as a dictionary, not " \
+                "%s." % (type(root).__name__))
+
+        if not self._offsets:
+            self._write_header(root)
+        elif self._last is None:
+            self._last = self.get(len(self) - 1)
+
+        version = len(self)
+        if version % self.keyframe_interval == 0:
+            kind, payload = _KEYFRAME, self.codec.dumps(root)
+        else:
+            operations = []
+            _diff(self._last, root, [], operations)
+            kind, payload = _DELTA, self.codec.dumps(operations)
+
+        with open(self.path, 'ab') as f_archive:
+            offset = f_archive.tell()
+            data = self._compress(payload.encode('utf-8'))
+            f_archive.write(pack(_RECORD, kind, len(data)) + data)
+
+        # The last version is kept as a private copy: the root itself may be
+        # edited in place once archived.
+        if kind == _KEYFRAME:
+            self._keyframes.append(version)
+            self._last = self.codec.loads(payload)
+        else:
+            self._last = _apply(self._last, self.codec.loads(payload))
+        self._offsets.append(offset)
+
+        return version
+
+
+    def export(self, version=None, f_output=None):
+        '''
+        Writes a version as JSON to the file object f_output, chunk by chunk,
+        byte-exact with PyShelter.to_json.
+        '''
+        from json import JSONEncoder
+
+        if f_output is None:
+            raise ValueError('The output file object must be provided.')
+
+        for chunk in JSONEncoder().iterencode(self.get(version)):
+            f_output.write(chunk)
+
+
+    def get(self, version=None):
+        '''
+        Returns the root of a version, as a new object. Negative versions are
+        counted from the last one.
+        '''
+        if not isinstance(version, int):
+            raise TypeError("The version must be provided as an int, not %s." \
+                % (type(version).__name__))
+        if version < 0:
+            version += len(self)
+        if not 0 <= version < len(self):
+            raise IndexError("There is no version %s." % (version))
+
+        keyframe = self._keyframes[bisect_right(self._keyframes, version) - 1]
+        with open(self.path, 'rb') as f_archive:
+            root = self.codec.loads(self._read(f_archive, keyframe))
+            for delta in range(keyframe + 1, version + 1):
+                root = _apply(root, self.codec.loads(self._read(f_archive,    \
+                    delta)))
+
+        return root
+
+
+    def _compress(self, data):
+        '''
+        Compresses a record.
+        '''
+        if self.compression == 'lzma':
+            from lzma import compress
+            return compress(data, preset=9)
+
+        from zlib import compressobj
+        compressor = compressobj(9, zdict=self._zdict)
+        return compressor.compress(data) + compressor.flush()
+
+
+    def _decompress(self, data):
+        '''
+        Decompresses a record.
+        '''
+        if self.compression == 'lzma':
+            from lzma import decompress
+            return decompress(data)
+
+        from zlib import decompressobj
+        decompressor = decompressobj(zdict=self._zdict)
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+    def _load_index(self):
+        '''
+        Reads the header of an existing archive and indexes its records.
+        '''
+        with open(self.path, 'rb') as f_archive:
+            if f_archive.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError("%s is not a snapshot archive." % (self.path))
+            method, self.keyframe_interval, zdict_size = unpack(_HEADER,      \
+                f_archive.read(calcsize(_HEADER)))
+            self.compression = _METHODS[method]
+            self._zdict = f_archive.read(zdict_size)
+
+            version = 0
+            while True:
+                offset = f_archive.tell()
+                header = f_archive.read(calcsize(_RECORD))
+                if len(header) < calcsize(_RECORD):
+                    break
+                kind, length = unpack(_RECORD, header)
+                if kind == _KEYFRAME:
+                    self._keyframes.append(version)
+                self._offsets.append(offset)
+                f_archive.seek(length, 1)
+                version += 1
+
+
+    def _read(self, f_archive, version):
+        '''
+        Returns the decompressed payload of a version.
+        '''
+        f_archive.seek(self._offsets[version])
+        _, length = unpack(_RECORD, f_archive.read(calcsize(_RECORD)))
+        return self._decompress(f_archive.read(length))
+
+
+    def _write_header(self, root):
+        '''
+        Creates the archive, training the zlib dictionary on root.
+        '''
+        self._zdict = _train_dictionary(root, self.codec)                     \
+            if self.compression == 'zlib' else b''
+
+        with open(self.path, 'wb') as f_archive:
+            f_archive.write(_MAGIC + pack(_HEADER,                            \
+                _METHODS.index(self.compression), self.keyframe_interval,     \
+                len(self._zdict)) + self._zdict)
+
+
+def _apply(root, operations):
+    '''
+    Applies the operations of a delta to root, in place, and returns the new
+    root.
+    '''
+    for operation in operations:
+        path = operation[1]
+        if operation[0] == 's':
+            if not path:
+                root = operation[2]
+                continue
+            node = root
+            for key in path[:-1]:
+                node = node[key]
+            node[path[-1]] = operation[2]
+        else:
+            node = root
+            for key in path:
+                node = node[key]
+            node[operation[2]:operation[3]] = operation[4]
+
+    return root
+
+
+def _diff(old, new, path, operations):
+    '''
+    Appends to operations the edits turning old into new:
+
+        ['s', path, value]: sets the value at path
+        ['l', path, start, stop, values]: replaces a slice of the list at path
+
+    Dictionaries whose keys changed are set as a whole, so that the order of
+    their keys is kept.
+    '''
+    if type(old) is not type(new):
+        operations.append(['s', path, new])
+
+    elif isinstance(new, dict):
+        if len(old) != len(new) or list(old) != list(new):
+            operations.append(['s', path, new])
+            return
+        for key, value in new.items():
+            if old[key] is not value:
+                _diff(old[key], value, path + [key], operations)
+
+    elif isinstance(new, list):
+        if len(old) == len(new):
+            for i, (old_value, value) in enumerate(zip(old, new)):
+                _diff(old_value, value, path + [i], operations)
+            return
+
+        start = 0
+        while start < min(len(old), len(new)) and                             \
+            _same(old[start], new[start]):
+            start += 1
+        end = 0
+        while end < min(len(old), len(new)) - start and                       \
+            _same(old[-1 - end], new[-1 - end]):
+            end += 1
+        operations.append(['l', path, start, len(old) - end,                  \
+            new[start:len(new) - end]])
+
+    elif not _same(old, new):
+        operations.append(['s', path, new])
+
+
+def _same(old, new):
+    '''
+    Returns whether two values serialize the same way, down to their nested
+    values: True equals 1 and 1.0, 0.0 equals -0.0, but none of them are
+    serialized as such, and the order of the keys matters.
+    '''
+    if old is new:
+        return True
+    if type(old) is not type(new):
+        return False
+    if isinstance(new, dict):
+        return len(old) == len(new) and list(old) == list(new) and            \
+            all(_same(value, new[key]) for key, value in old.items())
+    if isinstance(new, list):
+        return len(old) == len(new) and                                       \
+            all(_same(old_value, value) for old_value, value in zip(old, new))
+    if isinstance(new, float):
+        return repr(old) == repr(new)
+    return old == new
+
+
+def _train_dictionary(root, codec):
+    '''
+    Returns a zlib dictionary made of the keys of root and of its most
+    recurring small objects, the most frequent last, as zlib favors the end of
+    its dictionary.
+    '''
+    fragments = Counter()
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                fragments[codec.dumps(key) + ': '] += 1
+                walk(value)
+            if len(node) <= 8 and not any(isinstance(value, (dict, list))     \
+                for value in node.values()):
+                fragments[codec.dumps(node)] += 1
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(root)
+
+    zdict = b''
+    for fragment, _ in fragments.most_common():
+        fragment = fragment.encode('utf-8')
+        if len(zdict) + len(fragment) > _ZDICT_SIZE:
+            break
+        zdict = fragment + zdict
+
+    return zdict
@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+
+'''
+This module provides benchmarks of PyShelter. Each benchmark returns its
+measurements, so that it can be used by tests and scripts alike, and can be
+run from the command line:
+
+    python -m pyshelter.utils.benchmarks archive
+    python -m pyshelter.utils.benchmarks codecs
+    python -m pyshelter.utils.benchmarks concurrency
+    python -m pyshelter.utils.benchmarks importtime
+'''
+
+from random import Random
+from subprocess import run
+from sys import argv, executable
+from time import perf_counter
+
+
+# Maximum cumulative import time, in microseconds, of the modules used by
+# short-lived invocations.
+IMPORT_TIME_BUDGET = {
+    'pyshelter' : 5000,
+    'pyshelter.classes.pyshelter' : 15000,
+}
+
+# Modules that must not be imported until they are actually needed.
+IMPORT_TIME_FORBIDDEN = ('pprint', 'yaml')
+
+
+def import_time(module_name='pyshelter', repeat=5):
+    '''
+    Returns the cumulative import time, in microseconds, of a module in a
+    fresh interpreter, as reported by -X importtime, along with the names of
+    all the modules it imported: (microseconds, modules). The fastest of
+    'repeat' runs is kept, to factor out the file system cache.
+    '''
+    if not isinstance(module_name, str):
+        raise TypeError("The module name must be provided as a string, not "  \
+            "%s." % (type(module_name).__name__))
+
+    best = None
+    for _ in range(repeat):
+        completed = run([executable, '-X', 'importtime', '-c',                \
+            "import %s" % (module_name)], capture_output=True, text=True,     \
+            check=True)
+
+        cumulative = None
+        modules = []
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            _, cumulative_us, imported = line.split('|')
+            if not cumulative_us.strip().isdigit():
+                continue
+            modules.append(imported.strip())
+            if imported.strip() == module_name:
+                cumulative = int(cumulative_us)
+
+        if cumulative is None:
+            raise RuntimeError("%s was already imported at startup."          \
+                % (module_name))
+        if best is None or cumulative < best[0]:
+            best = (cumulative, modules)
+
+    return best
+
+
+def synthetic_save(dwellers=100, seed=0):
+    '''
+    Returns a synthetic saved game holding the given number of Dwellers. The
+    size of the rest of the Vault grows with it: one room every four Dwellers,
+    fifty inventory items per Dweller and a Team every ten Dwellers. Only the
+    keys PyShelter relies upon are generated.
+    '''
+    if not isinstance(dwellers, int):
+        raise TypeError("The number of Dwellers must be provided as an int, " \
+            "not %s." % (type(dwellers).__name__))
+
+    random = Random(seed)
+    junk = ('AlarmClock', 'Camera', 'DuctTape', 'Globe', 'GoldWatch', 'Yarn')
+    room_types = ('Cafeteria', 'Geothermal', 'LivingQuarters', 'MedBay',      \
+        'Storage', 'WaterPlant')
+
+    save = {
+        'dwellers' : {'dwellers' : []},
+        'vault' : {
+            'VaultMode' : 'Normal',
+            'VaultName' : '101',
+            'inventory' : {'items' : []},
+            'rooms' : [],
+            'storage' : {'resources' : {'Food' : 1000.0, 'Nuka' : 5000.0,     \
+                'NukaColaQuantum' : 10.0, 'RadAway' : 25.0,                   \
+                'StimPack' : 25.0, 'Water' : 1000.0}},
+            'wasteland' : {'teams' : []}
+        }
+    }
+
+    for i in range(max(1, dwellers // 4)):
+        save['vault']['rooms'].append({
+            'col' : (i % 3) * 3,
+            'deserializeID' : i,
+            'dwellers' : [],
+            'level' : random.randint(1, 3),
+            'mergeLevel' : random.randint(1, 3),
+            'mrHandyList' : [],
+            'row' : i // 3 + 1,
+            'type' : room_types[i % len(room_types)]
+        })
+
+    for i in range(dwellers):
+        level = random.randint(1, 50)
+        save['dwellers']['dwellers'].append({
+            'experience' : {'accum' : 0, 'currentLevel' : level,              \
+                'experienceValue' : random.uniform(0, 1e6),                   \
+                'needLvUp' : False, 'storage' : 0,                            \
+                'wastelandExperience' : 0},
+            'gender' : random.randint(1, 2),
+            'health' : {'healthValue' : 105.0 + level * 5.0,                  \
+                'lastLevelUpdated' : level,                                   \
+                'maxHealth' : 105.0 + level * random.uniform(2.5, 8.5),       \
+                'permaDeath' : False, 'radiationValue' : 0.0},
+            'lastName' : "Surname%s" % (random.randint(0, dwellers // 2)),
+            'name' : "Name%s" % (random.randint(0, dwellers // 2)),
+            'relations' : {'ascendants' : [random.randrange(i)                \
+                if i and random.random() < 0.3 else -1 for _ in range(6)]},
+            'savedRoom' : random.randrange(len(save['vault']['rooms'])),
+            'serializeId' : i,
+            'stats' : {'stats' : [{'value' : random.randint(1, 10)}           \
+                for _ in range(8)]}
+        })
+        room = save['vault']['rooms'][save['dwellers']['dwellers'][-1]        \
+            ['savedRoom']]
+        room['dwellers'].append(i)
+
+    save['vault']['inventory']['items'] = sorted(({
+        'hasBeenAssigned' : False,
+        'hasRandonWeaponBeenAssigned' : False,
+        'id' : random.choice(junk),
+        'type' : 'Junk'
+    } for _ in range(dwellers * 50)), key=lambda item: item['id'])
+
+    for i in range(0, dwellers - 2, 10):
+        save['vault']['wasteland']['teams'].append({
+            'dwellers' : [i, i + 1, i + 2],
+            'elapsedTimeAliveExploring' : random.uniform(0, 86400),
+            'teamEquipment' : {'inventory' : {'items' : [{
+                'hasBeenAssigned' : False,
+                'hasRandonWeaponBeenAssigned' : False,
+                'id' : random.choice(junk),
+                'type' : 'Junk'
+            } for _ in range(random.randint(0, 50))]}, 'radaways' : 5,        \
+                'stimpacks' : 10}
+        })
+
+    return save
+
+
+def codec_throughput(sizes=(10, 100, 1000), repeat=5):
+    '''
+    Returns the parse and serialize throughput, in MB/s, of every codec
+    installed on synthetic saves of increasing size, and whether each codec
+    round-trips them byte-exactly: {(codec, dwellers) : (parse, serialize,
+    byte_exact)}. The fastest of 'repeat' runs is kept.
+    '''
+    from pyshelter.utils.json_codecs import available_codecs, get_codec,     \
+        JSONCodec
+
+    baseline = JSONCodec()
+    codecs = available_codecs() + [get_codec()]
+
+    measurements = {}
+    for size in sizes:
+        save = baseline.dumps(synthetic_save(size)).encode('utf-8')
+        megabytes = len(save) / 1e6
+
+        for codec in codecs:
+            parse = serialize = float('inf')
+            for _ in range(repeat):
+                start = perf_counter()
+                data = codec.loads(save)
+                parse = min(parse, perf_counter() - start)
+
+                start = perf_counter()
+                output = codec.dumps(data)
+                serialize = min(serialize, perf_counter() - start)
+
+            measurements[(codec.name, size)] = (round(megabytes / parse, 1),  \
+                round(megabytes / serialize, 1), output.encode('utf-8') == save)
+
+    return measurements
+
+
+def archive_history(versions=100, dwellers=100, seed=0):
+    '''
+    Returns a synthetic history of a Vault: 'versions' roots, each derived
+    from the previous one by the edits a player makes between two saves:
+    Dwellers leveling up, moving rooms, junk collected and resources spent.
+    '''
+    from copy import deepcopy
+
+    random = Random(seed)
+    root = synthetic_save(dwellers, seed)
+    history = [root]
+
+    for _ in range(versions - 1):
+        root = deepcopy(root)
+        for dweller in random.sample(root['dwellers']['dwellers'],            \
+            max(1, dwellers // 10)):
+            dweller['experience']['experienceValue'] += random.uniform(0, 1e3)
+            dweller['savedRoom'] = random.randrange(                          \
+                len(root['vault']['rooms']))
+        items = root['vault']['inventory']['items']
+        for _ in range(random.randint(0, 20)):
+            items.insert(random.randrange(len(items) + 1), dict(items[0]))
+        del items[:random.randint(0, 10)]
+        root['vault']['storage']['resources']['Nuka'] -= random.uniform(0, 50)
+        history.append(root)
+
+    return history
+
+
+def archive_compression(versions=100, dwellers=100, keyframe_interval=32,
+    samples=20):
+    '''
+    Returns, for each compression method, the compression ratio of a
+    synthetic history against its raw JSON dumps and the restore latency, in
+    milliseconds, of random versions: {method : (ratio, mean, max)}.
+    '''
+    from os import remove
+    from tempfile import mkstemp
+
+    from pyshelter.utils.archive import SnapshotArchive
+    from pyshelter.utils.json_codecs import JSONCodec
+
+    history = archive_history(versions, dwellers)
+    raw_size = sum(len(JSONCodec().dumps(root)) for root in history)
+    random = Random(0)
+
+    measurements = {}
+    for method in ('zlib', 'lzma'):
+        _, path = mkstemp(suffix='.psa')
+        try:
+            remove(path)
+            archive = SnapshotArchive(path, keyframe_interval, method)
+            for root in history:
+                archive.append(root)
+
+            with open(path, 'rb') as f_archive:
+                ratio = raw_size / float(len(f_archive.read()))
+
+            latencies = []
+            for version in random.sample(range(versions),                     \
+                min(samples, versions)):
+                start = perf_counter()
+                SnapshotArchive(path).get(version)
+                latencies.append((perf_counter() - start) * 1000)
+        finally:
+            remove(path)
+
+        measurements[method] = (round(ratio, 1),                              \
+            round(sum(latencies) / len(latencies), 2), round(max(latencies), 2))
+
+    return measurements
+
+
+def concurrency_throughput(readers=8, duration=1.0, dwellers=100,
+    modes=('unsafe', 'lock', 'snapshot')):
+    '''
+    Returns the throughput of reader threads, retrain reports, homonyms and
+    inventory stats, sharing one PyShelter instance with a writer thread
+    resetting Dwellers and sending them on coffee break, along with the number
+    of inconsistent reads: {mode : (reads/s, writes/s, violations)}.
+
+    The modes are 'unsafe', reading the live tree without locking, 'lock',
+    reading it under the read lock of a SharedShelter, and 'snapshot',
+    reading the snapshots it publishes. A read is inconsistent if it raises,
+    or sees a Dweller whose experience was reset but not its health, or the
+    other way around. Only the 'unsafe' mode is expected to report any.
+    '''
+    from copy import deepcopy
+    from os import remove
+    from tempfile import mkstemp
+    from threading import Event, Thread
+
+    from pyshelter.classes.pyshelter import PyShelter
+    from pyshelter.utils.concurrency import SharedShelter
+    from pyshelter.utils.json_codecs import JSONCodec
+
+    descriptor, path = mkstemp(suffix='.json')
+    try:
+        with open(descriptor, 'w') as f_save:
+            f_save.write(JSONCodec().dumps(synthetic_save(dwellers)))
+
+        measurements = {}
+        for mode in modes:
+            shelter = PyShelter(path)
+            shelter.compact_inventory()
+            live = shelter.dwellers_view()
+            shared = SharedShelter(shelter, snapshots=(mode == 'snapshot'))
+            originals = [(deepcopy(dweller['experience']),                    \
+                deepcopy(dweller['health'])) for dweller in live]
+
+            stop = Event()
+            counts = {'reads' : [0] * readers, 'violations' : [0] * readers,  \
+                'writes' : 0}
+
+            def edit(i):
+                dweller = live[i]
+                if dweller['experience']['experienceValue'] == 605.0:
+                    shelter.journal.assign(dweller, 'experience',             \
+                        originals[i][0])
+                    shelter.journal.assign(dweller, 'health', originals[i][1])
+                else:
+                    shelter.reset_dweller(i)
+                    live.coffee_break(i)
+
+            def write():
+                i = 0
+                while not stop.is_set():
+                    if mode == 'unsafe':
+                        edit(i)
+                    else:
+                        with shared.writing():
+                            edit(i)
+                    counts['writes'] += 1
+                    i = (i + 1) % len(live)
+
+            def read_once(dwellers, inventory):
+                dwellers.to_retrain()
+                dwellers.homonyms
+                inventory.count_by_rarity()
+                return sum(1 for dweller in dwellers if                       \
+                    (dweller['experience']['experienceValue'] == 605.0) !=    \
+                    (dweller['health']['maxHealth'] == 105.0))
+
+            def read(reader):
+                while not stop.is_set():
+                    try:
+                        if mode == 'snapshot':
+                            snapshot = shared.snapshot()
+                            violations = read_once(snapshot.dwellers,         \
+                                snapshot.inventory)
+                        elif mode == 'lock':
+                            with shared.reading() as reading:
+                                violations = read_once(live, reading.inventory)
+                        else:
+                            violations = read_once(live, shelter.inventory)
+                    except Exception:
+                        violations = 1
+                    counts['reads'][reader] += 1
+                    counts['violations'][reader] += violations
+
+            threads = [Thread(target=write)] + [Thread(target=read,           \
+                args=(reader,)) for reader in range(readers)]
+            start = perf_counter()
+            for thread in threads:
+                thread.start()
+            stop.wait(duration)
+            stop.set()
+            for thread in threads:
+                thread.join()
+            elapsed = perf_counter() - start
+
+            measurements[mode] = (round(sum(counts['reads']) / elapsed, 1),   \
+                round(counts['writes'] / elapsed, 1), sum(counts['violations']))
+    finally:
+        remove(path)
+
+    return measurements
+
+
+def check_import_time(budget=None):
+    '''
+    Checks the import time of the modules against their budget, and that none
+    of them eagerly imports a forbidden module. Returns the measured import
+    times, by module; raises AssertionError on the first violation.
+    '''
+    if budget is None:
+        budget = IMPORT_TIME_BUDGET
+
+    measurements = {}
+    for module_name, budget_us in sorted(budget.items()):
+        cumulative, modules = import_time(module_name)
+        measurements[module_name] = cumulative
+
+        if cumulative > budget_us:
+            raise AssertionError("Importing %s took %sus, over its budget of "\
+                "%sus." % (module_name, cumulative, budget_us))
+        for forbidden in IMPORT_TIME_FORBIDDEN:
+            if forbidden in modules:
+                raise AssertionError("Importing %s eagerly imports %s."       \
+                    % (module_name, forbidden))
+
+    return measurements
+
+
+def main(arguments=None):
+    '''
+    Runs the requested benchmark and prints its measurements.
+    '''
+    benchmarks = {
+        'archive' : archive_compression,
+        'codecs' : codec_throughput,
+        'concurrency' : concurrency_throughput,
+        'importtime' : check_import_time,
+    }
+
+    arguments = argv[1:] if arguments is None else arguments
+    if len(arguments) != 1 or arguments[0] not in benchmarks:
+        raise SystemExit("Usage: python -m pyshelter.utils.benchmarks %s"     \
+            % ('|'.join(sorted(benchmarks))))
+
+    for name, value in sorted(benchmarks[arguments[0]]().items()):
+        print("%s: %s" % (name, value))
+
+
+if __name__ == '__main__':
+    main()
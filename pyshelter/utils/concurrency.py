@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+
+'''
+This module provides concurrent access to a PyShelter instance shared by many
+reader threads, e.g. analytics, and one editor thread.
+
+The SharedShelter class offers two ways to read:
+
+    reading(): the readers share a read lock and see the live tree; the
+        writer waits for them to release it, and they wait for the writer to
+        finish its edits, hence they never see a half-edited tree.
+    snapshot(): the readers get the immutable copy of the tree published
+        after the last edit, its epoch. They take no lock at all and never
+        block the writer.
+
+Edits are made within writing(), which holds the write lock and runs the
+edits as a single transaction of the journal of the PyShelter instance; undo()
+and redo() hold it as well.
+
+Snapshots are not copies of the whole tree. The journal reports the
+(container, key) pairs each transaction assigned: the next snapshot shares
+all the nodes of the previous one, except the ones on the path from the root
+to those containers, which are copied, and the values assigned, which are
+deep-copied from the live tree. The path of each live container is looked up
+in an index of the tree, built once and extended with the values assigned; it
+is only rebuilt when an edit made it stale, e.g. when a list is reordered, or
+when it holds more replaced containers than live ones.
+'''
+
+from contextlib import contextmanager
+from threading import Condition, Lock
+
+
+class ReadWriteLock(object):
+    '''
+    The ReadWriteLock class lets many readers or a single writer hold it. A
+    waiting writer has precedence over new readers, so that a steady flow of
+    readers cannot starve it.
+    '''
+    def __init__(self):
+        '''
+        Initializes a released ReadWriteLock.
+        '''
+        self._condition = Condition(Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+
+    @contextmanager
+    def read(self):
+        '''
+        Holds the lock as a reader within the context.
+        '''
+        with self._condition:
+            while self._writer or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+
+    @contextmanager
+    def write(self):
+        '''
+        Holds the lock as the writer within the context.
+        '''
+        with self._condition:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class Snapshot(object):
+    '''
+    The Snapshot class represents an immutable copy of the tree of a
+    PyShelter instance at a given epoch. It must not be modified, as it is
+    shared by all the readers.
+    '''
+    def __init__(self, epoch, root):
+        '''
+        Initializes a Snapshot of root, taken at epoch.
+        '''
+        self.epoch = epoch
+        self.root = root
+
+
+    @property
+    def dwellers(self):
+        '''
+        Lazily returns the Dwellers of the Snapshot. Readers racing to build
+        them build equal instances, and the last one built is kept.
+        '''
+        if not hasattr(self, '_dwellers'):
+            from pyshelter.classes.dwellers import Dwellers
+            self._dwellers = Dwellers(self.root['dwellers']['dwellers'])
+
+        return self._dwellers
+
+
+    @property
+    def expeditions(self):
+        '''
+        Returns the expeditions tree of the Snapshot.
+        '''
+        return self.root['vault']['wasteland']['teams']
+
+
+    @property
+    def inventory(self):
+        '''
+        Lazily returns the Inventory of the Snapshot, as for the Dwellers.
+        '''
+        if not hasattr(self, '_inventory'):
+            from pyshelter.classes.inventory import Inventory
+            self._inventory = Inventory(                                      \
+                self.root['vault']['inventory']['items'])
+
+        return self._inventory
+
+
+class SharedShelter(object):
+    '''
+    The SharedShelter class guards a PyShelter instance shared by many threads.
+    '''
+    def __init__(self, shelter=None, snapshots=True):
+        '''
+        Initializes the SharedShelter of shelter. If snapshots is False, no
+        copy is published after the edits and only reading() is available.
+        '''
+        if shelter is None:
+            raise ValueError('The PyShelter instance must be provided.')
+
+        self.shelter = shelter
+        self.snapshots = snapshots
+
+        self._epoch = 0
+        self._indexed = 0
+        self._lock = ReadWriteLock()
+        self._paths = None
+        self._snapshot = None
+        self._touched = {}
+
+        if snapshots:
+            self._snapshot = Snapshot(0, _copy(shelter.to_dict()))
+            shelter.journal.subscribe(self._touch)
+
+
+    @property
+    def epoch(self):
+        '''
+        Returns the number of edits committed so far.
+        '''
+        return self._epoch
+
+
+    @contextmanager
+    def reading(self):
+        '''
+        Returns a context in which the live PyShelter instance can be read, as
+        long as it is not modified.
+
+        The lock is neither reentrant nor upgradable, and prefers the writer:
+        once a writer waits, new readers wait for it, hence a thread nesting
+        reading() contexts, or calling writing() within one, deadlocks.
+        '''
+        with self._lock.read():
+            yield self.shelter
+
+
+    def redo(self):
+        '''
+        Applies again the last edit undone, and publishes the result.
+        '''
+        with self._lock.write():
+            self.shelter.redo()
+            self._publish()
+
+
+    def snapshot(self):
+        '''
+        Returns the Snapshot published after the last edit, without locking.
+        '''
+        if self._snapshot is None:
+            raise RuntimeError('Snapshots are disabled.')
+        return self._snapshot
+
+
+    def undo(self):
+        '''
+        Reverts the last edit, and publishes the result.
+        '''
+        with self._lock.write():
+            self.shelter.undo()
+            self._publish()
+
+
+    @contextmanager
+    def writing(self):
+        '''
+        Returns a context in which the PyShelter instance can be edited. The
+        edits are a single transaction: if an exception is raised, they are
+        rolled back and no epoch is published.
+        '''
+        with self._lock.write():
+            with self.shelter.transaction():
+                yield self.shelter
+            self._publish()
+
+
+    def _index(self):
+        '''
+        Indexes the path of every container of the live tree, by identity.
+        '''
+        self._paths = {}
+        _walk(self.shelter.root, (), self._paths)
+        self._indexed = len(self._paths)
+
+
+    def _path(self, container):
+        '''
+        Returns the path of a live container, or None if it is no longer part
+        of the tree. The index is rebuilt if it is stale.
+        '''
+        if self._paths is None:
+            self._index()
+
+        for attempt in range(2):
+            entry = self._paths.get(id(container))
+            if entry is not None and entry[0] is container and                \
+                _resolve(self.shelter.root, entry[1]) is container:
+                return entry[1]
+            if attempt == 0:
+                self._index()
+
+        return None
+
+
+    def _publish(self):
+        '''
+        Publishes the next epoch, copying only the paths edited since the
+        previous one.
+        '''
+        self._epoch += 1
+        if not self.snapshots:
+            return
+
+        touched, self._touched = self._touched, {}
+        root = self._snapshot.root
+        if touched:
+            root = self._update(root, touched.values())
+        self._snapshot = Snapshot(self._epoch, root)
+
+        # The index keeps the containers replaced alive: it is rebuilt once
+        # they outnumber the live ones.
+        if self._paths is not None and len(self._paths) > 2 * self._indexed:
+            self._index()
+
+
+    def _touch(self, entries):
+        '''
+        Records the (container, key) pairs assigned by the journal, in order.
+        '''
+        for container, key, _, _ in entries:
+            self._touched[(id(container), key)] = (container, key)
+
+
+    def _update(self, root, touched):
+        '''
+        Returns a new snapshot root, sharing the nodes of root except the
+        ones on the paths to the touched keys. Falls back to a full copy if
+        a container cannot be located.
+        '''
+        copies = set()
+
+        def copy_node(node):
+            node = dict(node) if isinstance(node, dict) else list(node)
+            copies.add(id(node))
+            return node
+
+        root = copy_node(root)
+        for container, key in touched:
+            if not isinstance(container, (dict, list)):
+                return _copy(self.shelter.to_dict())
+            path = self._path(container)
+            if path is None:
+                # The container was detached by a later edit.
+                continue
+
+            node = root
+            for step in path:
+                child = node[step]
+                if id(child) not in copies:
+                    child = copy_node(child)
+                    node[step] = child
+                node = child
+
+            try:
+                value = container[key]
+            except (IndexError, KeyError):
+                del node[key]
+                continue
+
+            node[key] = _copy(value)
+            _walk(value, path + (key,), self._paths)
+
+        return root
+
+
+def _copy(value):
+    '''
+    Returns a deep copy of a value of the tree. A compact Inventory, wherever
+    it stands within the value, is copied as the list of items the game
+    expects.
+    '''
+    if isinstance(value, dict):
+        return {key: _copy(child) for key, child in value.items()}
+    if isinstance(value, list):
+        return [_copy(child) for child in value]
+    if hasattr(value, 'to_list'):
+        return _copy(value.to_list())
+    return value
+
+
+def _resolve(root, path):
+    '''
+    Returns the node of root at path, or None if there is none.
+    '''
+    node = root
+    try:
+        for step in path:
+            node = node[step]
+    except (IndexError, KeyError, TypeError):
+        return None
+    return node
+
+
+def _walk(node, path, paths):
+    '''
+    Records in paths the path of node and of all the containers below it.
+    '''
+    if isinstance(node, dict):
+        paths[id(node)] = (node, path)
+        for key, value in node.items():
+            if isinstance(value, (dict, list)):
+                _walk(value, path + (key,), paths)
+    elif isinstance(node, list):
+        paths[id(node)] = (node, path)
+        for i, value in enumerate(node):
+            if isinstance(value, (dict, list)):
+                _walk(value, path + (i,), paths)
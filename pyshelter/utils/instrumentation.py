@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+
+'''
+This module provides timing and counting hooks to PyShelter. Every public
+method of the instrumented classes, as well as the loading of the static
+catalogs and the JSON I/O, reports each call to the active sink. When no sink
+is active, which is the default, the methods of the instrumented classes are
+left untouched: their wrappers are only installed by enable() and removed by
+disable(). Instrumented functions, such as load_static_data, keep their
+wrapper, which costs an extra call and a global lookup when disabled.
+
+Sinks are plain objects exposing an emit(record) method. Records are
+dictionaries holding the name of the operation, its duration in seconds and,
+if memory tracing is enabled, the memory allocated and the peak reached during
+the outermost operation. As tracemalloc traces the whole process, the
+outermost operations of different threads run one at a time while memory is
+traced, so that none of them resets the peak of another.
+'''
+
+from collections import defaultdict
+from functools import wraps
+from threading import Lock, local
+from time import perf_counter
+
+
+_sink = None
+_trace_memory = False
+# The depth of the operations running, per thread.
+_calls = local()
+# Held by the outermost operation running while memory is traced.
+_memory_lock = Lock()
+
+# Classes decorated by instrument_class, and the original attributes of the
+# ones whose wrappers are installed, by class.
+_classes = []
+_originals = {}
+
+
+def disable():
+    '''
+    Disables the instrumentation, restoring the original methods of the
+    instrumented classes. Memory tracing is stopped, if it had been started
+    by enable().
+    '''
+    global _sink, _trace_memory
+
+    for cls in _classes:
+        _uninstall(cls)
+
+    if _trace_memory:
+        import tracemalloc
+        tracemalloc.stop()
+
+    _sink = None
+    _trace_memory = False
+
+
+def enable(sink=None, trace_memory=False):
+    '''
+    Enables the instrumentation, reporting to the given sink, and installs
+    the wrappers of the instrumented classes. If trace_memory
+    is True, tracemalloc is started and each outermost operation also reports
+    the memory it allocated and its peak.
+    '''
+    global _sink, _trace_memory
+
+    if sink is None:
+        raise ValueError('A sink must be provided.')
+    if not callable(getattr(sink, 'emit', None)):
+        raise TypeError("The sink must provide an emit method, %s does not."  \
+            % (type(sink).__name__))
+
+    if bool(trace_memory) != _trace_memory:
+        import tracemalloc
+        if trace_memory:
+            tracemalloc.start()
+        else:
+            tracemalloc.stop()
+
+    _sink = sink
+    _trace_memory = bool(trace_memory)
+
+    for cls in _classes:
+        _install(cls)
+
+
+def instrument(name=None):
+    '''
+    Decorates a function so that each call is reported to the active sink as
+    the operation 'name'. The function name is used when no name is given.
+    '''
+    def decorator(function):
+        operation = name if name is not None else function.__qualname__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _sink is None:
+                return function(*args, **kwargs)
+            return _measure(operation, function, args, kwargs)
+
+        wrapper.__instrumented__ = True
+        return wrapper
+
+    return decorator
+
+
+def instrument_class(cls):
+    '''
+    Decorates a class so that all its public methods and property accessors
+    are instrumented while a sink is active. Only the attributes defined by
+    the class itself are wrapped, not the ones inherited from list or dict.
+    '''
+    _classes.append(cls)
+    if _sink is not None:
+        _install(cls)
+
+    return cls
+
+
+def _install(cls):
+    '''
+    Replaces the public methods and property accessors of cls with their
+    instrumented wrappers, keeping the originals. Does nothing if they are
+    already installed.
+    '''
+    if cls in _originals:
+        return
+
+    originals = {}
+    for attribute_name, attribute in list(vars(cls).items()):
+        if attribute_name.startswith('_'):
+            continue
+        operation = "%s.%s" % (cls.__name__, attribute_name)
+
+        if isinstance(attribute, property):
+            originals[attribute_name] = attribute
+            setattr(cls, attribute_name, property(
+                _wrap(attribute.fget, operation),
+                _wrap(attribute.fset, "%s=" % (operation)),
+                attribute.fdel,
+                attribute.__doc__))
+        elif callable(attribute):
+            originals[attribute_name] = attribute
+            setattr(cls, attribute_name, _wrap(attribute, operation))
+
+    _originals[cls] = originals
+
+
+def _uninstall(cls):
+    '''
+    Restores the original public methods and property accessors of cls.
+    '''
+    for attribute_name, attribute in _originals.pop(cls, {}).items():
+        setattr(cls, attribute_name, attribute)
+
+
+def _wrap(function, operation):
+    '''
+    Instruments function as operation, unless it is missing or already
+    instrumented.
+    '''
+    if function is None or getattr(function, '__instrumented__', False):
+        return function
+    return instrument(operation)(function)
+
+
+def _measure(operation, function, args, kwargs):
+    '''
+    Calls function, reporting its duration and, if requested, its memory usage
+    to the active sink. Memory is only traced for the outermost operation, as
+    the peak tracemalloc reports cannot be nested, and under _memory_lock, as
+    it cannot be shared by threads either.
+    '''
+    sink = _sink
+    depth = getattr(_calls, 'depth', 0)
+    trace_memory = _trace_memory and depth == 0
+
+    if trace_memory:
+        import tracemalloc
+        _memory_lock.acquire()
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+
+    _calls.depth = depth + 1
+    start = perf_counter()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        duration = perf_counter() - start
+        _calls.depth = depth
+
+        record = {'operation' : operation, 'duration' : duration}
+        if trace_memory:
+            memory_after, memory_peak = tracemalloc.get_traced_memory()
+            _memory_lock.release()
+            record['memory'] = memory_after - memory_before
+            record['memory_peak'] = memory_peak - memory_before
+        sink.emit(record)
+
+
+class MemorySink(object):
+    '''
+    The MemorySink class aggregates the records in memory, per operation.
+    '''
+    def __init__(self):
+        '''
+        Initializes an empty MemorySink.
+        '''
+        self.stats = defaultdict(lambda : {
+            'calls' : 0,
+            'duration' : 0.0,
+            'duration_max' : 0.0,
+            'memory' : 0,
+            'memory_peak' : 0
+        })
+
+
+    def emit(self, record):
+        '''
+        Aggregates a record into the statistics of its operation.
+        '''
+        stats = self.stats[record['operation']]
+        stats['calls'] += 1
+        stats['duration'] += record['duration']
+        stats['duration_max'] = max(stats['duration_max'], record['duration'])
+        stats['memory'] += record.get('memory', 0)
+        stats['memory_peak'] = max(stats['memory_peak'],                      \
+            record.get('memory_peak', 0))
+
+
+    def memory_report(self):
+        '''
+        Returns the operations for which memory was traced, sorted by their
+        peak, largest first: [(operation, memory, memory_peak)].
+        '''
+        return sorted(((operation, stats['memory'], stats['memory_peak'])     \
+            for operation, stats in self.stats.items()                        \
+            if stats['memory_peak']), key=lambda entry: entry[2], reverse=True)
+
+
+    def report(self):
+        '''
+        Returns the aggregated statistics, sorted by total duration, slowest
+        first: [(operation, calls, duration, duration_max)].
+        '''
+        return sorted(((operation, stats['calls'], stats['duration'],         \
+            stats['duration_max']) for operation, stats in self.stats.items()),\
+            key=lambda entry: entry[2], reverse=True)
+
+
+    def reset(self):
+        '''
+        Drops all the aggregated statistics.
+        '''
+        self.stats.clear()
+
+
+class JSONLinesSink(object):
+    '''
+    The JSONLinesSink class appends every record to a file, one JSON object
+    per line.
+    '''
+    def __init__(self, output_file=None):
+        '''
+        Initializes a JSONLinesSink writing to output_file.
+        '''
+        if output_file is None:
+            raise ValueError('An output file must be provided.')
+
+        from json import dumps
+
+        self._dumps = dumps
+        self._f_output_file = open(output_file, 'a')
+
+
+    def close(self):
+        '''
+        Closes the underlying file.
+        '''
+        self._f_output_file.close()
+
+
+    def emit(self, record):
+        '''
+        Writes a record as a line of JSON.
+        '''
+        self._f_output_file.write(self._dumps(record) + '\n')
+        self._f_output_file.flush()
+
+
+class PrometheusSink(MemorySink):
+    '''
+    The PrometheusSink class aggregates the records in memory and writes them
+    to a file in the Prometheus text exposition format, so that they can be
+    collected by the node exporter's textfile collector.
+    '''
+    def __init__(self, output_file=None, prefix='pyshelter'):
+        '''
+        Initializes a PrometheusSink writing to output_file.
+        '''
+        if output_file is None:
+            raise ValueError('An output file must be provided.')
+        super(PrometheusSink, self).__init__()
+        self.output_file = output_file
+        self.prefix = prefix
+
+
+    def write(self):
+        '''
+        Writes the current statistics to the output file. The file is replaced
+        atomically, so that collectors never read a partial exposition.
+        '''
+        from os import replace
+
+        metrics = (
+            ('calls_total', 'counter', 'calls', 'Number of calls.'),
+            ('duration_seconds_total', 'counter', 'duration',
+                'Total time spent, in seconds.'),
+            ('duration_seconds_max', 'gauge', 'duration_max',
+                'Slowest call, in seconds.'),
+            ('memory_peak_bytes', 'gauge', 'memory_peak',
+                'Largest memory peak of a call, in bytes.'),
+        )
+
+        lines = []
+        for metric, metric_type, key, description in metrics:
+            metric_name = "%s_%s" % (self.prefix, metric)
+            lines.append("# HELP %s %s" % (metric_name, description))
+            lines.append("# TYPE %s %s" % (metric_name, metric_type))
+            for operation, stats in sorted(self.stats.items()):
+                lines.append('%s{operation="%s"} %r' % (metric_name,          \
+                    operation, stats[key]))
+
+        with open(self.output_file + '.tmp', 'w') as f_output_file:
+            f_output_file.write('\n'.join(lines) + '\n')
+        replace(self.output_file + '.tmp', self.output_file)
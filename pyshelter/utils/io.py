@@ -4,13 +4,22 @@
 This module provides I/O utilities to PyShelter.
 '''
 
-from yaml import load
+from os.path import dirname, join, realpath
 
+from pyshelter.utils.instrumentation import instrument
 
+
+_static_data = {}
+_static_path = join(dirname(dirname(realpath(__file__))), 'static')
+
+
+@instrument('io.load_static_data')
 def load_static_data(input_filename=None):
 	'''
 	Returns the data read from the desired static file. Available options are
-	'junk', 'outfits', 'rooms' and 'weapons'.
+	'junk', 'outfits', 'rooms' and 'weapons'. Each file is parsed once and
+	cached: the returned data is shared and must not be modified. PyYAML is
+	only imported the first time a file is actually parsed.
 	'''
 	if input_filename is None:
 		raise ValueError('The name of the file to load must be provided.')
@@ -22,9 +31,16 @@ def load_static_data(input_filename=None):
 			"'junk', 'outfits', 'rooms' or 'weapons', not %s."				  \
 			% (input_filename))
 
+	if input_filename in _static_data:
+		return _static_data[input_filename]
+
+	from yaml import load, SafeLoader
+
 	try:
-		with open("pyshelter/static/%s.yaml" % (input_filename), 'r') as f:
-			return load(f)
+		with open(join(_static_path, "%s.yaml" % (input_filename)), 'r') as f:
+			_static_data[input_filename] = load(f, Loader=SafeLoader)
 	except Exception as e:
 		print("%s.yaml could not be loaded." % (input_filename))
 		raise
+
+	return _static_data[input_filename]
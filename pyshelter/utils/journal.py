@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+'''
+This module provides the Journal, which records the edits made to the JSON so
+that they can be rolled back, undone and redone.
+
+Edits never modify a node of the JSON in place: they assign a new value, or a
+new node, to a key of its container. The Journal records the container, the
+key, the value it replaces and the new one. Untouched nodes are shared, and
+the replaced ones are kept alive by the Journal itself, hence neither the
+transaction nor the undo/redo stacks ever copy the JSON.
+'''
+
+from collections import deque
+from contextlib import contextmanager
+
+
+# Marks a key that did not exist before being assigned.
+_missing = object()
+
+
+class Journal(object):
+    '''
+    The Journal class records the edits made to the JSON, grouped in
+    transactions.
+    '''
+    def __init__(self, depth=50):
+        '''
+        Initializes an empty Journal, keeping at most 'depth' transactions to
+        undo.
+        '''
+        if not isinstance(depth, int):
+            raise TypeError("The depth of the Journal must be provided as an "\
+                "int, not %s." % (type(depth).__name__))
+        if depth < 1:
+            raise ValueError("The depth of the Journal must be positive, not "\
+                "%s." % (depth))
+
+        self._entries = None
+        self._hooks = []
+        self._redo = []
+        self._undo = deque(maxlen=depth)
+
+
+    def assign(self, container, key, value):
+        '''
+        Assigns value to container[key], recording the edit. Outside of a
+        transaction, the edit is a transaction of its own.
+        '''
+        if self._entries is None:
+            with self.transaction():
+                return self.assign(container, key, value)
+
+        try:
+            previous = container[key]
+        except KeyError:
+            previous = _missing
+
+        container[key] = value
+        self._entries.append((container, key, previous, value))
+
+
+    @property
+    def can_redo(self):
+        '''
+        Returns whether there is a transaction to redo.
+        '''
+        return bool(self._redo)
+
+
+    @property
+    def can_undo(self):
+        '''
+        Returns whether there is a transaction to undo.
+        '''
+        return bool(self._undo)
+
+
+    def redo(self):
+        '''
+        Applies again the last transaction undone.
+        '''
+        if self._entries is not None:
+            raise RuntimeError('Cannot redo within a transaction.')
+        if not self._redo:
+            raise IndexError('There is no transaction to redo.')
+
+        entries = self._redo.pop()
+        for container, key, previous, value in entries:
+            container[key] = value
+        self._undo.append(entries)
+        self._notify(entries)
+
+
+    def subscribe(self, hook=None):
+        '''
+        Registers hook, called with the edits of a transaction once it is
+        committed, and whenever they are applied again or reverted without
+        going through assign: on redo, undo and rollback. It lets the owners
+        of the JSON drop or update the data they derived from it.
+        '''
+        if not callable(hook):
+            raise TypeError("The hook must be callable, %s is not."           \
+                % (type(hook).__name__))
+
+        self._hooks.append(hook)
+
+
+    @contextmanager
+    def transaction(self):
+        '''
+        Groups all the edits made within the context into one transaction.
+        If an exception is raised, all of them are rolled back; otherwise they
+        are committed and can be undone as a whole. Nested transactions join
+        the outermost one.
+        '''
+        if self._entries is not None:
+            yield self
+            return
+
+        self._entries = entries = []
+        try:
+            yield self
+        except BaseException:
+            self._entries = None
+            self._revert(entries)
+            self._notify(entries)
+            raise
+
+        self._entries = None
+        if entries:
+            self._undo.append(entries)
+            del self._redo[:]
+            self._notify(entries)
+
+
+    def undo(self):
+        '''
+        Reverts the last transaction committed.
+        '''
+        if self._entries is not None:
+            raise RuntimeError('Cannot undo within a transaction.')
+        if not self._undo:
+            raise IndexError('There is no transaction to undo.')
+
+        entries = self._undo.pop()
+        self._revert(entries)
+        self._redo.append(entries)
+        self._notify(entries)
+
+
+    def _notify(self, entries):
+        '''
+        Calls the hooks with the edits committed, applied again or reverted.
+        '''
+        if entries:
+            for hook in self._hooks:
+                hook(entries)
+
+
+    def _revert(self, entries):
+        '''
+        Restores the values replaced by the given edits, latest first.
+        '''
+        for container, key, previous, value in reversed(entries):
+            if previous is _missing:
+                del container[key]
+            else:
+                container[key] = previous
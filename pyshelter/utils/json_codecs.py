@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+'''
+This module provides the JSON codecs used by PyShelter to load and save games.
+The standard library's json module is the baseline; orjson, ujson and pysimdjson
+are used, when installed, to speed up parsing.
+
+Saves written back must be accepted by the game, thus serialization must be
+byte-exact with the baseline: the same data must always produce the same
+bytes json.dumps would produce. None of the faster backends formats floats and
+separators the way the standard library does, hence they are flagged as not
+byte-exact and only used for parsing. Parsing falls back to the baseline
+whenever a faster backend rejects a document the baseline accepts, e.g. one
+holding NaN or a byte order mark. Some backends do not reject integers larger
+than 64 bits but silently turn them into floats: documents holding an integer
+of 19 digits or more are always parsed by the baseline.
+'''
+
+
+# Maps the digits to '1', the bytes a fractional part or an exponent follows to
+# '.' and every other byte to ' ': integers are runs of '1' following a ' '.
+_digits = bytes(ord('1') if byte in b'0123456789' else ord('.')              \
+    if byte in b'.eE' else ord(' ') for byte in range(256))
+
+# The integers that may not fit in 64 bits.
+_long_integer = b' ' + b'1' * 19
+
+
+class JSONCodec(object):
+    '''
+    The JSONCodec class wraps the json module of the standard library. It is
+    the baseline every other codec is compared with.
+    '''
+    byte_exact = True
+    name = 'json'
+
+    def __init__(self):
+        '''
+        Initializes the codec, importing its backend.
+        '''
+        from json import dumps, loads
+
+        self._dumps = dumps
+        self._loads = loads
+
+
+    def dumps(self, data):
+        '''
+        Returns the JSON representation of data, as a string.
+        '''
+        return self._dumps(data)
+
+
+    def loads(self, raw_data):
+        '''
+        Returns the data represented by raw_data, given as bytes or string.
+        '''
+        return self._loads(raw_data)
+
+
+class OrjsonCodec(JSONCodec):
+    '''
+    The OrjsonCodec class wraps orjson.
+    '''
+    byte_exact = False
+    name = 'orjson'
+
+    def __init__(self):
+        '''
+        Initializes the codec, importing its backend.
+        '''
+        from orjson import dumps, loads
+
+        self._orjson_dumps = dumps
+        self._loads = loads
+
+
+    def dumps(self, data):
+        '''
+        Returns the JSON representation of data, as a string.
+        '''
+        return self._orjson_dumps(data).decode('utf-8')
+
+
+class SimdjsonCodec(JSONCodec):
+    '''
+    The SimdjsonCodec class wraps pysimdjson. It only provides parsing:
+    serialization is delegated to the standard library.
+    '''
+    byte_exact = True
+    name = 'simdjson'
+
+    def __init__(self):
+        '''
+        Initializes the codec, importing its backend.
+        '''
+        from simdjson import Parser
+
+        super(SimdjsonCodec, self).__init__()
+        self._parser = Parser()
+
+
+    def loads(self, raw_data):
+        '''
+        Returns the data represented by raw_data, given as bytes or string.
+        '''
+        if isinstance(raw_data, str):
+            raw_data = raw_data.encode('utf-8')
+        return self._parser.parse(raw_data, recursive=True)
+
+
+class UjsonCodec(JSONCodec):
+    '''
+    The UjsonCodec class wraps ujson.
+    '''
+    byte_exact = False
+    name = 'ujson'
+
+    def __init__(self):
+        '''
+        Initializes the codec, importing its backend.
+        '''
+        from ujson import dumps, loads
+
+        self._ujson_dumps = dumps
+        self._loads = loads
+
+
+    def dumps(self, data):
+        '''
+        Returns the JSON representation of data, as a string.
+        '''
+        return self._ujson_dumps(data, ensure_ascii=True)
+
+
+class Codec(object):
+    '''
+    The Codec class combines the fastest parser available with a byte-exact
+    serializer. Documents the parser rejects are parsed again by the baseline.
+    '''
+    byte_exact = True
+
+    def __init__(self, parser=None, serializer=None):
+        '''
+        Initializes a Codec. Both the parser and the serializer default to the
+        baseline.
+        '''
+        self._baseline = JSONCodec()
+        self.parser = parser if parser is not None else self._baseline
+        self.serializer = serializer if serializer is not None                \
+            else self._baseline
+
+        if not self.serializer.byte_exact:
+            raise ValueError("%s is not byte-exact and cannot be used to "    \
+                "serialize." % (self.serializer.name))
+
+        self.name = self.parser.name if self.parser is self.serializer else   \
+            "%s+%s" % (self.parser.name, self.serializer.name)
+
+
+    def dumps(self, data):
+        '''
+        Returns the JSON representation of data, as a string.
+        '''
+        return self.serializer.dumps(data)
+
+
+    def loads(self, raw_data):
+        '''
+        Returns the data represented by raw_data, given as bytes or string.
+        '''
+        if self.parser is self._baseline or _has_long_integer(raw_data):
+            return self._baseline.loads(raw_data)
+        try:
+            return self.parser.loads(raw_data)
+        except (OverflowError, ValueError):
+            return self._baseline.loads(raw_data)
+
+
+# Backends, fastest first.
+_backends = (OrjsonCodec, SimdjsonCodec, UjsonCodec, JSONCodec)
+
+
+def available_codecs():
+    '''
+    Returns an instance of every backend installed, fastest first.
+    '''
+    codecs = []
+    for backend in _backends:
+        try:
+            codecs.append(backend())
+        except ImportError:
+            continue
+
+    return codecs
+
+
+def get_codec(name=None):
+    '''
+    Returns the codec to load and save games. When no name is given, the
+    fastest parser installed is combined with the fastest byte-exact
+    serializer. Otherwise the named backend is used for both; only byte-exact
+    backends can be requested by name.
+    '''
+    if name is None:
+        codecs = available_codecs()
+        return Codec(codecs[0], [codec for codec in codecs                    \
+            if codec.byte_exact][0])
+
+    if not isinstance(name, str):
+        raise TypeError("The codec name must be provided as a string, not %s."\
+            % (type(name).__name__))
+
+    backends = {backend.name : backend for backend in _backends}
+    if name not in backends:
+        raise ValueError("The codec must be one of %s, not %s."               \
+            % (', '.join(sorted(backends)), name))
+
+    backend = backends[name]()
+    return Codec(backend, backend if backend.byte_exact else None)
+
+
+def round_trips(codec, raw_data):
+    '''
+    Returns whether raw_data, loaded and saved back through codec, produces
+    the very same bytes as it would through the baseline.
+    '''
+    baseline = JSONCodec()
+    return codec.dumps(codec.loads(raw_data)) ==                              \
+        baseline.dumps(baseline.loads(raw_data))
+
+
+def _has_long_integer(raw_data):
+    '''
+    Returns whether raw_data may hold an integer of 19 digits or more. Digits
+    within strings may report one that is not there, which only costs a
+    slower parse.
+    '''
+    if isinstance(raw_data, str):
+        raw_data = raw_data.encode('utf-8')
+
+    digits = raw_data.translate(_digits)
+    return digits.startswith(_long_integer[1:]) or _long_integer in digits
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+
+'''
+This module provides the watch mode of PyShelter: saved games written to a
+directory are processed as soon as they change, instead of reloading every
+save on a timer.
+
+Changes are detected through inotify on Linux, falling back to polling the
+modification time and size of the saves elsewhere. A save is processed once
+it has not been written for 'debounce' seconds, and only if its content hash
+differs from the one last processed. Saves to process are queued to a pool of
+worker threads; the queue is bounded, so that a burst of changes blocks the
+watcher, rather than piling up work, until the workers catch up. A save is
+never processed by two workers at once: if it changes while being processed,
+the worker processes it again once done. While idle, the watcher sleeps on
+inotify and uses no CPU.
+
+Saves edited by the operations are only written back if they still hold the
+content that was loaded, so that a save written by the game in the meantime
+is never overwritten. They are written to a temporary file first, then
+atomically moved over the save.
+'''
+
+from fnmatch import fnmatch
+from hashlib import sha256
+from os import close, listdir, remove, replace, stat
+from os.path import dirname, isdir, join, realpath
+from queue import Queue
+from threading import Event, Lock, Thread
+from time import monotonic
+
+
+# Operations that can be run on a save, by name. Each is called with the
+# PyShelter instance of the save and returns its result, if any.
+OPERATIONS = {
+    'junk_drop' : lambda shelter: shelter.drop_vault_inventory_junk(),
+    'loot_filter' : lambda shelter: shelter.drop_expeditions_nornmal_loot(),
+    'retrain_report' : lambda shelter: dict(shelter.dwellers_to_retrain()),
+}
+
+# Operations editing the save, which is written back if write_back is set.
+EDITING_OPERATIONS = ('junk_drop', 'loot_filter')
+
+# inotify events: IN_CLOSE_WRITE, IN_MOVED_TO and IN_Q_OVERFLOW.
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0x00000800
+_IN_CLOEXEC = 0x00080000
+
+
+class Watcher(object):
+    '''
+    The Watcher class watches a directory of saves and processes the ones
+    that change.
+    '''
+    def __init__(self, directory=None, operations=('retrain_report',),
+        workers=2, queue_size=16, debounce=0.2, pattern='*.json',
+        write_back=False, on_result=None, polling=None, interval=1.0):
+        '''
+        Initializes a Watcher of directory, running the given operations on
+        each save matching pattern once it changes. on_result, if provided, is
+        called with the path of each save processed and the results of the
+        operations, by name. inotify is used if available, unless polling is
+        True; polling checks the saves every 'interval' seconds.
+        '''
+        if directory is None:
+            raise ValueError('The directory to watch must be provided.')
+        if not isdir(directory):
+            raise ValueError("%s is not a directory." % (directory))
+        for operation in operations:
+            if operation not in OPERATIONS:
+                raise ValueError("The operation must be one of %s, not %s."   \
+                    % (', '.join(sorted(OPERATIONS)), operation))
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError("The number of workers must be a positive int, " \
+                "not %s." % (workers))
+
+        self.debounce = debounce
+        self.directory = realpath(directory)
+        self.interval = interval
+        self.on_result = on_result
+        self.operations = tuple(operations)
+        self.pattern = pattern
+        self.write_back = write_back
+
+        self._changed = set()
+        self._digests = {}
+        self._lock = Lock()
+        self._pending = {}
+        self._queue = Queue(maxsize=queue_size)
+        self._queued = set()
+        self._running = set()
+        self._stop = Event()
+        self._workers = [Thread(target=self._work, daemon=True)               \
+            for _ in range(workers)]
+
+        self._source = None if polling else _inotify_source(self.directory)
+        if self._source is None:
+            self._source = _PollingSource(self.directory, self.pattern)
+
+
+    def process(self, path=None):
+        '''
+        Processes a save, if its content changed since it was last processed,
+        and returns the results of the operations, by name, or None if it was
+        unchanged.
+        '''
+        if path is None:
+            raise ValueError('The path of the save must be provided.')
+
+        from pyshelter.classes.pyshelter import PyShelter
+
+        digest = _digest(path)
+        with self._lock:
+            if self._digests.get(path) == digest:
+                return None
+            self._digests[path] = digest
+
+        shelter = PyShelter(path)
+        results = {operation : OPERATIONS[operation](shelter)                 \
+            for operation in self.operations}
+
+        if self.write_back and shelter.journal.can_undo and                   \
+            set(self.operations) & set(EDITING_OPERATIONS):
+            self._write_back(shelter, path, digest)
+
+        if self.on_result is not None:
+            self.on_result(path, results)
+        return results
+
+
+    def run(self, process_existing=False):
+        '''
+        Watches the directory until stop is called. Saves already in the
+        directory are processed first if process_existing is True.
+        '''
+        for worker in self._workers:
+            worker.start()
+
+        if process_existing:
+            for filename in sorted(listdir(self.directory)):
+                if fnmatch(filename, self.pattern):
+                    self._enqueue(join(self.directory, filename))
+
+        try:
+            while not self._stop.is_set():
+                now = monotonic()
+                ready = [path for path, deadline in self._pending.items()    \
+                    if deadline <= now]
+                for path in ready:
+                    del self._pending[path]
+                    self._enqueue(path)
+
+                if self._pending:
+                    timeout = max(0.0, min(self._pending.values()) - now)
+                else:
+                    timeout = self.interval
+                for filename in self._source.changes(timeout):
+                    if fnmatch(filename, self.pattern):
+                        self._pending[join(self.directory, filename)] =       \
+                            monotonic() + self.debounce
+        finally:
+            for _ in self._workers:
+                self._queue.put(None)
+            for worker in self._workers:
+                worker.join()
+            self._source.close()
+
+
+    def stop(self):
+        '''
+        Stops watching. The saves already queued are still processed.
+        '''
+        self._stop.set()
+
+
+    def _enqueue(self, path):
+        '''
+        Queues a save to process, unless it is already queued. A save being
+        processed is flagged instead, for its worker to process it again.
+        Blocks while the queue is full.
+        '''
+        with self._lock:
+            if path in self._queued:
+                return
+            if path in self._running:
+                self._changed.add(path)
+                return
+            self._queued.add(path)
+        self._queue.put(path)
+
+
+    def _work(self):
+        '''
+        Processes the queued saves until a None is dequeued. A save changed
+        while being processed is processed again by the same worker.
+        '''
+        while True:
+            path = self._queue.get()
+            if path is None:
+                return
+            with self._lock:
+                self._queued.discard(path)
+                self._running.add(path)
+
+            while True:
+                try:
+                    self.process(path)
+                except Exception as e:
+                    print("%s could not be processed: %s" % (path, e))
+                with self._lock:
+                    if path not in self._changed:
+                        self._running.discard(path)
+                        break
+                    self._changed.discard(path)
+
+
+    def _write_back(self, shelter, path, digest):
+        '''
+        Writes an edited save back, unless it no longer holds the content
+        that was loaded, i.e. its digest. The save is written to a temporary
+        file in the same directory, then moved over the original.
+        '''
+        from shutil import copymode
+        from tempfile import mkstemp
+
+        if _digest(path) != digest:
+            print("%s changed while being processed, it is not written back." \
+                % (path))
+            return
+
+        descriptor, temporary_path = mkstemp(dir=dirname(path), prefix='.',   \
+            suffix='.tmp')
+        close(descriptor)
+        try:
+            shelter.to_json(temporary_path)
+            copymode(path, temporary_path)
+            replace(temporary_path, path)
+        except BaseException:
+            remove(temporary_path)
+            raise
+
+        with self._lock:
+            self._digests[path] = _digest(path)
+
+
+class _InotifySource(object):
+    '''
+    The _InotifySource class reports the files written to a directory, through
+    inotify.
+    '''
+    def __init__(self, libc, directory):
+        '''
+        Initializes the inotify watch of directory.
+        '''
+        from ctypes import get_errno
+        from os import fsencode, strerror
+
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(get_errno(), strerror(get_errno()))
+        if libc.inotify_add_watch(self._fd, fsencode(directory),              \
+            _IN_CLOSE_WRITE | _IN_MOVED_TO) < 0:
+            errno = get_errno()
+            close(self._fd)
+            raise OSError(errno, strerror(errno))
+        self._directory = directory
+
+
+    def changes(self, timeout):
+        '''
+        Waits up to timeout seconds for files to be written, and returns
+        their names.
+        '''
+        from os import fsdecode, read
+        from select import select
+        from struct import calcsize, unpack_from
+
+        if not select([self._fd], [], [], timeout)[0]:
+            return set()
+
+        header = calcsize('iIII')
+        changes = set()
+        while True:
+            try:
+                data = read(self._fd, 65536)
+            except BlockingIOError:
+                return changes
+
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = unpack_from('iIII', data, offset)
+                name = data[offset + header:offset + header + length]
+                offset += header + length
+                if mask & _IN_Q_OVERFLOW:
+                    changes.update(listdir(self._directory))
+                elif name:
+                    changes.add(fsdecode(name.rstrip(b'\0')))
+
+
+    def close(self):
+        '''
+        Closes the inotify watch.
+        '''
+        close(self._fd)
+
+
+class _PollingSource(object):
+    '''
+    The _PollingSource class reports the files written to a directory, by
+    comparing their modification time and size every time it is polled.
+    '''
+    def __init__(self, directory, pattern):
+        '''
+        Initializes the polling of directory.
+        '''
+        self._directory = directory
+        self._pattern = pattern
+        self._stats = self._scan()
+
+
+    def changes(self, timeout):
+        '''
+        Waits timeout seconds, then returns the names of the files changed.
+        '''
+        Event().wait(timeout)
+
+        stats = self._scan()
+        changes = {filename for filename, file_stat in stats.items()          \
+            if self._stats.get(filename) != file_stat}
+        self._stats = stats
+        return changes
+
+
+    def close(self):
+        '''
+        Nothing to release.
+        '''
+
+
+    def _scan(self):
+        '''
+        Returns the modification time and size of the files matching the
+        pattern, by name.
+        '''
+        stats = {}
+        for filename in listdir(self._directory):
+            if not fnmatch(filename, self._pattern):
+                continue
+            try:
+                file_stat = stat(join(self._directory, filename))
+            except FileNotFoundError:
+                continue
+            stats[filename] = (file_stat.st_mtime_ns, file_stat.st_size)
+        return stats
+
+
+def _digest(path):
+    '''
+    Returns the SHA-256 digest of the content of a file.
+    '''
+    with open(path, 'rb') as f_input_file:
+        return sha256(f_input_file.read()).hexdigest()
+
+
+def _inotify_source(directory):
+    '''
+    Returns an _InotifySource of directory, or None if inotify is not
+    available.
+    '''
+    from ctypes import CDLL
+    from ctypes.util import find_library
+    from sys import platform
+
+    if not platform.startswith('linux'):
+        return None
+    try:
+        libc = CDLL(find_library('c') or 'libc.so.6', use_errno=True)
+        return _InotifySource(libc, directory)
+    except (AttributeError, OSError):
+        return None
@@ -1,4 +1,4 @@
-from distutils.core import setup
+from setuptools import setup
 from json import loads
 from os.path import dirname, realpath
 
@@ -6,6 +6,9 @@ setup(
     author = 'Jascha Casadio',
     author_email = 'jaschacasadio@gmail.com',
     description = 'A web application to manage Fallout Shelter(C) Vaults',
+    extras_require = {
+                'forecast' : ['numpy>=1.17'],
+                },
     license = 'LICENSE',
     long_description = open('README').read(),
     name = 'pyshelter',